@@ -0,0 +1,129 @@
+import json
+import math
+import geopandas
+import numpy
+import pandas
+import shapely
+from output import ChunkedWriter
+
+# Per-building travel times summarised on hexagon or square grid cells, so the map layers are sized by the area and
+# the cell size instead of the number of buildings. Cells are laid out in metres in the region's UTM zone.
+GRIDS = ("Hexagon", "Square")
+SUMMARY = ("Median Travel Time", "Min Travel Time", "Buildings", "Dominant Mode")
+
+
+def grid_cells(x, y, grid: str, size: float):
+    # Integer (column, row) of the cell holding each projected point. Squares are size metres on a side; hexagons
+    # are pointy-topped with centres size metres apart, in axial coordinates rounded through cube coordinates.
+    if grid == "Square":
+        return numpy.column_stack([numpy.floor(x / size), numpy.floor(y / size)]).astype(numpy.int64)
+    radius = size / math.sqrt(3)
+    q = (math.sqrt(3) / 3 * x - y / 3) / radius
+    r = 2 / 3 * y / radius
+    s = -q - r
+    roundq, roundr, rounds = numpy.round(q), numpy.round(r), numpy.round(s)
+    errorq, errorr, errors = numpy.abs(roundq - q), numpy.abs(roundr - r), numpy.abs(rounds - s)
+    fixq = (errorq > errorr) & (errorq > errors)
+    fixr = ~fixq & (errorr > errors)
+    roundq[fixq] = -roundr[fixq] - rounds[fixq]
+    roundr[fixr] = -roundq[fixr] - rounds[fixr]
+    return numpy.column_stack([roundq, roundr]).astype(numpy.int64)
+
+
+def cell_polygons(cells, grid: str, size: float):
+    if grid == "Square":
+        return shapely.box(cells[:, 0] * size, cells[:, 1] * size, (cells[:, 0] + 1) * size, (cells[:, 1] + 1) * size)
+    radius = size / math.sqrt(3)
+    centrex = size * (cells[:, 0] + cells[:, 1] / 2)
+    centrey = 1.5 * radius * cells[:, 1]
+    angles = numpy.radians(30 + 60 * numpy.arange(7))
+    return shapely.polygons(numpy.stack([centrex[:, None] + radius * numpy.cos(angles),
+                                         centrey[:, None] + radius * numpy.sin(angles)], axis=2))
+
+
+def summarise_cells(cells, times, modes):
+    # The occupied cells and, for each, the median and minimum travel time and the most common fastest mode over
+    # its reachable buildings (finite times), and its building count. Everything is one sort by (cell, time).
+    low = cells.min(axis=0) if len(cells) else numpy.zeros(2, dtype=numpy.int64)
+    rows = cells[:, 1].max() - low[1] + 1 if len(cells) else 1
+    packed, inverse = numpy.unique((cells[:, 0] - low[0]) * rows + cells[:, 1] - low[1], return_inverse=True)
+    keys = numpy.column_stack(numpy.divmod(packed, rows)) + low
+    inverse = inverse.reshape(-1)
+    reachable = numpy.isfinite(times)
+    cell, value = inverse[reachable], times[reachable]
+    order = numpy.lexsort((value, cell))
+    cell, value, mode = cell[order], value[order], modes[reachable][order]
+    counts = numpy.bincount(cell, minlength=len(keys))
+    start = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]]).astype(int)
+    occupied = counts > 0
+    median, minimum = numpy.full(len(keys), numpy.nan), numpy.full(len(keys), numpy.nan)
+    minimum[occupied] = value[start[occupied]]
+    median[occupied] = (value[start[occupied] + (counts[occupied] - 1) // 2]
+                        + value[start[occupied] + counts[occupied] // 2]) / 2
+    dominant, share = numpy.full(len(keys), None, dtype=object), numpy.full(len(keys), numpy.nan)
+    codes, names = pandas.factorize(mode, use_na_sentinel=False)
+    if len(names):
+        pairs, paircounts = numpy.unique(cell * len(names) + codes, return_counts=True)
+        paircell, paircode = numpy.divmod(pairs, len(names))
+        # Most buildings first within each cell; ties go to the mode seen first
+        best = numpy.lexsort((-paircounts, paircell))
+        best = best[numpy.concatenate([[True], paircell[best][1:] != paircell[best][:-1]])]
+        dominant[paircell[best]] = numpy.asarray(names, dtype=object)[paircode[best]]
+        share[paircell[best]] = paircounts[best] / counts[paircell[best]]
+    return keys, pandas.DataFrame({"Column": keys[:, 0], "Row": keys[:, 1],
+                                   "Buildings": numpy.bincount(inverse, minlength=len(keys)),
+                                   "Reachable Buildings": counts, "Median Travel Time": median,
+                                   "Min Travel Time": minimum, "Dominant Mode": dominant,
+                                   "Dominant Mode Share": share})
+
+
+def write_grids(prefix: str, gdfclean: geopandas.GeoDataFrame, times, modes, grid: str = "Hexagon",
+                sizes: [float] = (250, 500, 1000), raster: bool = False, extension: str = ".parquet",
+                geojson: bool = False):
+    # One cell layer per size, written as prefix_hexagon250.parquet and so on, plus with raster a tiled GeoTIFF of
+    # the smallest square cells. times and modes are per building in gdfclean's row order. Returns the paths.
+    crs = gdfclean.geometry.estimate_utm_crs()
+    centres = gdfclean.geometry.to_crs(crs).centroid
+    x, y = centres.x.to_numpy(), centres.y.to_numpy()
+    times, modes = numpy.asarray(times, dtype=float), numpy.asarray(modes, dtype=object)
+    paths = []
+    for size in sizes:
+        keys, summary = summarise_cells(grid_cells(x, y, grid, size), times, modes)
+        path = "{}_{}{:g}{}".format(prefix, grid.lower(), size, extension)
+        with ChunkedWriter(path, geojson) as writer:
+            writer.write(geopandas.GeoDataFrame(summary, geometry=cell_polygons(keys, grid, size), crs=crs))
+        paths.append(path)
+    if raster:
+        size = min(sizes)
+        paths.append(write_raster("{}_raster{:g}.tif".format(prefix, size), x, y, times, modes, crs, size))
+    return paths
+
+
+def write_raster(path: str, x, y, times, modes, crs, size: float):
+    # Square cells as a tiled, compressed GeoTIFF with overviews, which ArcGIS draws at any scale without reading
+    # anything per building. The bands follow SUMMARY; the mode band holds indices into the band's "modes" tag.
+    # rasterio is only needed here, so runs without a raster do not need it installed.
+    import rasterio
+    import rasterio.enums
+    import rasterio.transform
+    keys, summary = summarise_cells(grid_cells(x, y, "Square", size), times, modes)
+    low, high = keys.min(axis=0), keys.max(axis=0)
+    width, height = (high - low + 1).tolist()
+    names = sorted(summary["Dominant Mode"].dropna().unique())
+    codes = summary["Dominant Mode"].map({name: i for i, name in enumerate(names)})
+    bands = numpy.full((len(SUMMARY), height, width), numpy.nan, dtype=numpy.float32)
+    for band, values in enumerate([summary["Median Travel Time"], summary["Min Travel Time"],
+                                   summary["Buildings"], codes]):
+        bands[band, high[1] - keys[:, 1], keys[:, 0] - low[0]] = values.to_numpy(dtype=float)
+    transform = rasterio.transform.from_origin(low[0] * size, (high[1] + 1) * size, size, size)
+    with rasterio.open(path, "w", driver="GTiff", width=width, height=height, count=len(SUMMARY),
+                       dtype="float32", crs=crs.to_wkt(), transform=transform, nodata=numpy.nan, tiled=True,
+                       blockxsize=256, blockysize=256, compress="deflate") as dataset:
+        dataset.write(bands)
+        for band, name in enumerate(SUMMARY, 1):
+            dataset.set_band_description(band, name)
+        dataset.update_tags(len(SUMMARY), modes=json.dumps(names))
+        factors = [2 ** i for i in range(1, 8) if 2 ** i < max(width, height)]
+        if factors:
+            dataset.build_overviews(factors, rasterio.enums.Resampling.nearest)
+    return path
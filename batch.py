@@ -0,0 +1,42 @@
+import numpy
+import pandas
+from walking import walk_times_from_nodes, walk_times_to_nodes
+
+
+def batch_travel_times(graph, nodes, destinations: dict, stop_nodes: [int], buildingwalk, raptor, time_of_day: float,
+                       origin: bool = True, max_transfers: int = 2, walking: bool = True):
+    # Minutes between every building and each destination as one (buildings, destinations) array per mode.
+    # destinations maps a name to its walk graph node. Walking is one multi-target search over the graph and
+    # transit one round-based run, both shared by every destination.
+    targets = numpy.array(list(destinations.values()), dtype=numpy.int64)
+    times = {}
+    if walking:
+        times["Walking"] = walk_times_to_nodes(graph, nodes, targets) / 60
+    if raptor is not None:
+        times["Transit"] = raptor.batch_travel_times(buildingwalk, walk_times_from_nodes(graph, targets, stop_nodes),
+                                                     time_of_day, origin, max_transfers)
+    return times
+
+
+def batch_table(times: dict, names: [str], index, layout: str = "Wide", nearest: bool = False):
+    # Wide gives one column per destination with the fastest mode's minutes; Long gives one row per building and
+    # destination with a column per mode. nearest reduces either to the closest destination for each building.
+    names = numpy.asarray(names, dtype=object)
+    modes = numpy.asarray(list(times), dtype=object)
+    stacked = numpy.stack(list(times.values()))
+    fastest = numpy.fmin.reduce(stacked, axis=0)
+    if nearest:
+        reachable = ~numpy.isnan(fastest).all(axis=1)
+        best = numpy.argmin(numpy.where(numpy.isnan(fastest), numpy.inf, fastest), axis=1)
+        rows = numpy.arange(len(fastest))
+        bestmodes = numpy.argmin(numpy.where(numpy.isnan(stacked), numpy.inf, stacked)[:, rows, best], axis=0)
+        return pandas.DataFrame({"nearest_destination": numpy.where(reachable, names[best], None),
+                                 "nearest_time": fastest[rows, best],
+                                 "nearest_mode": numpy.where(reachable, modes[bestmodes], None)}, index=index)
+    if layout == "Wide":
+        return pandas.DataFrame(fastest, index=index, columns=names)
+    table = pandas.DataFrame({"destination": numpy.tile(names, len(fastest))}, index=numpy.repeat(index, len(names)))
+    for mode, values in times.items():
+        table[mode] = values.reshape(-1)
+    table["fastest"] = fastest.reshape(-1)
+    return table
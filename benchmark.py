@@ -0,0 +1,269 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import geopandas
+import networkx
+import numpy
+from output import write_columns
+from pipeline import Options, run
+from timetable import Timetable
+from utils import CalculateTravelTime, CalculateTravelTimes, building_keys
+from walkgraph import WalkGraph
+from walking import precompute_walk_table, walk_times_to_node
+from walkmatrix import WalkMatrix, load_walk_matrix
+
+# Offline benchmarks of the routing paths on fixtures built from MercedCounty.feather and a synthetic grid walk
+# graph covering the same area. Each case runs in its own process so one case's peak RSS never includes another's.
+# Nothing here needs ArcGIS, OSM downloads or the shipped graph.
+#
+#   python benchmark.py --scales 1000 10000 --workers 1 4
+#   python benchmark.py --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json
+#
+# route-batched times CalculateTravelTimes, which the pipeline uses; route-legacy times the original per-building
+# CalculateTravelTime on the first LEGACY_SAMPLE buildings, so the two throughputs show the speedup.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CASES = ("walk", "route-batched", "route-legacy", "precompute", "fastest", "output")
+PARALLEL = ("precompute", "fastest")
+TIME_OF_DAY = 510
+# Buildings the legacy kernel is timed on; at about 30 building-route calls a second all of them would take hours
+LEGACY_SAMPLE = 20
+# Bumped whenever build_fixture changes what it writes, so older fixture folders are rebuilt
+FIXTURE_VERSION = 2
+
+
+def grid_graph(bounds, buildings: int, speed_kph: float = 5):
+    # Square street grid over bounds with about one intersection per two buildings, streets both ways
+    side = max(int(math.ceil(math.sqrt(buildings / 2))), 20)
+    xs = numpy.linspace(bounds[0], bounds[2], side)
+    ys = numpy.linspace(bounds[1], bounds[3], side)
+    dx = (xs[1] - xs[0]) * 111320 * math.cos(math.radians(ys.mean()))
+    dy = (ys[1] - ys[0]) * 110540
+    graph = networkx.MultiDiGraph()
+    for i in range(side):
+        for j in range(side):
+            graph.add_node(i * side + j + 1, x=xs[j], y=ys[i])
+    for i in range(side):
+        for j in range(side):
+            node = i * side + j + 1
+            if j + 1 < side:
+                graph.add_edge(node, node + 1, length=dx)
+                graph.add_edge(node + 1, node, length=dx)
+            if i + 1 < side:
+                graph.add_edge(node, node + side, length=dy)
+                graph.add_edge(node + side, node, length=dy)
+    return WalkGraph.from_networkx(graph, speed_kph)
+
+
+def build_fixture(path: str, buildings: int, seed: int = 0):
+    # Buildings are sampled from MercedCounty.feather (with a little jitter and fresh ids once there are more than
+    # the county has), snapped to the grid, and every stop in the timetable is put on a random grid node. The
+    # files are laid out like a precomputed toolbox run (GraphML with its compiled graph, BusDatabase.feather with
+    # its walk matrix, a stop coordinate file) so the fastest case can time pipeline.run itself.
+    if os.path.isfile(os.path.join(path, "fixture.json")):
+        with open(os.path.join(path, "fixture.json")) as f:
+            if json.load(f).get("version") == FIXTURE_VERSION:
+                return
+    started = time.perf_counter()
+    rng = numpy.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+    county = geopandas.read_feather(os.path.join(HERE, "MercedCounty.feather"), columns=["element", "id", "geometry"])
+    sample = county.iloc[rng.integers(0, len(county), buildings) if buildings > len(county) else
+                         numpy.sort(rng.choice(len(county), buildings, replace=False))].reset_index(drop=True)
+    if buildings > len(county):
+        sample["id"] = numpy.arange(1, buildings + 1)
+        sample.geometry = geopandas.points_from_xy(sample.geometry.x + rng.normal(0, 2e-4, buildings),
+                                                   sample.geometry.y + rng.normal(0, 2e-4, buildings), crs=county.crs)
+    graph = grid_graph(county.total_bounds, buildings)
+    # The GraphML is written first so the compiled graph saved after it counts as up to date
+    networkx.write_graphml(graph.to_networkx(), os.path.join(path, "graph.graphml"))
+    graph.save(os.path.join(path, "graph.walkgraph"))
+    sample["nearestnode"] = graph.nearest_nodes(sample.geometry.x.to_numpy(), sample.geometry.y.to_numpy())
+    sample.to_feather(os.path.join(path, "buildings.feather"))
+    timetable = Timetable.load(os.path.join(HERE, "BusSchedules", "schedules.json"))
+    stop_nodes = dict(zip(timetable.stop_ids, rng.choice(graph.node_ids, len(timetable.stop_ids)).tolist()))
+    busdatabase = precompute_walk_table(graph, sample, stop_nodes, os.path.join(path, "checkpoint"))
+    busdatabase.to_feather(os.path.join(path, "BusDatabase.feather"))
+    WalkMatrix.from_table(busdatabase, timetable.stop_ids).save(os.path.join(path, "BusDatabase.walkmatrix"))
+    shutil.rmtree(os.path.join(path, "checkpoint"))
+    # Stops sit exactly on their nodes, so the pipeline snaps them back to the same nodes
+    position = graph.node_index(list(stop_nodes.values()))
+    with open(os.path.join(path, "stops.json"), "w") as f:
+        json.dump({stop_id: [float(graph.x[i]), float(graph.y[i])] for stop_id, i in zip(stop_nodes, position)}, f)
+    with open(os.path.join(path, "fixture.json"), "w") as f:
+        json.dump({"version": FIXTURE_VERSION, "buildings": buildings, "nodes": len(graph.node_ids),
+                   "stop_nodes": stop_nodes, "seconds": time.perf_counter() - started}, f)
+
+
+def peak_rss_mb():
+    # Peak resident memory of this process and of its largest finished child (pool workers), in MB
+    try:
+        import resource
+    except ImportError:
+        import ctypes
+        import ctypes.wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", ctypes.wintypes.DWORD), ("PageFaultCount", ctypes.wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                                 counters.cb)
+        return counters.PeakWorkingSetSize / 1024 ** 2, None
+    unit = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1024 ** 2,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1024 ** 2)
+
+
+def run_case(case: str, path: str, workers: int):
+    # Times one case on a fixture and returns seconds, the number of items processed and per-route details
+    with open(os.path.join(path, "fixture.json")) as f:
+        fixture = json.load(f)
+    graph = WalkGraph.load(os.path.join(path, "graph.walkgraph"))
+    buildings = geopandas.read_feather(os.path.join(path, "buildings.feather"))
+    timetable = Timetable.load(os.path.join(HERE, "BusSchedules", "schedules.json"))
+    routes = timetable.routes("Weekday")
+    stop_ids = list(dict.fromkeys(stop.OSM_ID for route in routes for stop in route.stops))
+    walkmatrix = load_walk_matrix(os.path.join(path, "BusDatabase.feather"))
+    buildingwalk = walkmatrix.walk(building_keys(buildings), stop_ids)
+    destinationwalk = buildingwalk[0]
+    details = {}
+    setuprss = peak_rss_mb()[0]
+    started = time.perf_counter()
+    if case == "walk":
+        targets = numpy.random.default_rng(1).choice(graph.node_ids, 10)
+        for target in targets.tolist():
+            walk_times_to_node(graph, buildings["nearestnode"], target)
+        items = len(buildings) * len(targets)
+    elif case == "route-batched":
+        # CalculateTravelTimes, every building at once per route, as the pipeline runs it
+        columns = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+        for route in routes:
+            routestops = [columns[stop.OSM_ID] for stop in route.stops]
+            routestarted = time.perf_counter()
+            CalculateTravelTimes(destinationwalk[routestops], buildingwalk[:, routestops], route, TIME_OF_DAY)
+            details[route.route_name] = time.perf_counter() - routestarted
+        items = len(buildings) * len(routes)
+    elif case == "route-legacy":
+        # The original CalculateTravelTime, one building and route per call on the BusDatabase table, so its
+        # throughput can be set against route-batched
+        busdatabase = geopandas.read_feather(os.path.join(path, "BusDatabase.feather"))
+        busdatabase.index = busdatabase.index.set_levels(busdatabase.index.levels[0].str[0], level=0)
+        keys = [element[0] + str(osm_id) for element, osm_id in zip(buildings["element"], buildings["id"])]
+        started = time.perf_counter()
+        for route in routes:
+            routestarted = time.perf_counter()
+            for key in keys[:LEGACY_SAMPLE]:
+                CalculateTravelTime(busdatabase, route, TIME_OF_DAY, keys[0], key)
+            details[route.route_name] = time.perf_counter() - routestarted
+        items = min(len(keys), LEGACY_SAMPLE) * len(routes)
+    elif case == "precompute":
+        checkpoint = tempfile.mkdtemp()
+        try:
+            stop_nodes = fixture["stop_nodes"]
+            started = time.perf_counter()
+            precompute_walk_table(graph, buildings, stop_nodes, checkpoint, processes=workers)
+        finally:
+            shutil.rmtree(checkpoint, ignore_errors=True)
+        items = len(stop_nodes)
+    elif case == "fastest":
+        # The whole Fastest Mode run users make, from loading the precomputed files to the written output, with an
+        # empty result cache so every route is computed. The trace's stage times go in the details.
+        folder = tempfile.mkdtemp()
+        try:
+            options = Options(features=os.path.join(path, "buildings.feather"),
+                              bus_database=os.path.join(path, "BusDatabase.feather"),
+                              graphml=os.path.join(path, "graph.graphml"), stops=os.path.join(path, "stops.json"),
+                              poi=buildings["element"][0][0] + str(buildings["id"][0]), days=["Weekday"],
+                              time_of_day=TIME_OF_DAY, processes=workers, output_folder=folder,
+                              cache_folder=os.path.join(folder, "ResultCache"), profile=True)
+            started = time.perf_counter()
+            run(options, message=lambda text: None, warning=lambda text: None)
+            with open(os.path.join(folder, "trace.json")) as f:
+                details = {event["name"]: event["dur"] / 1e6 for event in json.load(f)["traceEvents"]
+                           if event.get("args", {}).get("depth") == 0}
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        items = len(buildings)
+    elif case == "output":
+        rng = numpy.random.default_rng(2)
+        columns = {route.route_name: rng.uniform(5, 120, len(buildings)) for route in routes}
+        columns["fastest_route_method"] = numpy.array([route.route_name for route in routes], dtype=object)[
+            rng.integers(0, len(routes), len(buildings))]
+        folder = tempfile.mkdtemp()
+        try:
+            started = time.perf_counter()
+            write_columns(os.path.join(folder, "fastestmode.parquet"), buildings, columns)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        items = len(buildings)
+    else:
+        raise ValueError("Unknown benchmark case " + case)
+    seconds = time.perf_counter() - started
+    rss, workerrss = peak_rss_mb()
+    # The peak can only grow, so its rise over the peak after loading the fixture is what the case itself needed
+    return {"seconds": seconds, "items": items, "throughput": items / seconds, "peak_rss_mb": rss,
+            "case_rss_mb": rss - setuprss, "worker_peak_rss_mb": workerrss, "details": details}
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    # Keys whose time grew by more than tolerance (a fraction) over the baseline
+    return {key: (baseline[key]["seconds"], result["seconds"]) for key, result in results.items()
+            if key in baseline and result["seconds"] > baseline[key]["seconds"] * (1 + tolerance)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the routing paths on synthetic Merced-scale fixtures")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 32])
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=CASES)
+    parser.add_argument("--fixtures", default=os.path.join(os.getcwd(), "benchmark_fixtures"))
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="write this run's results to this JSON file")
+    parser.add_argument("--case", nargs=3, metavar=("CASE", "FIXTURE", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], int(args.case[2]))))
+        return 0
+    results = {}
+    for scale in args.scales:
+        path = os.path.join(args.fixtures, str(scale))
+        build_fixture(path, scale)
+        for case in args.cases:
+            for workers in (args.workers if case in PARALLEL else [1]):
+                key = "{}/{}/{}".format(case, scale, workers)
+                child = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", case, path, str(workers)],
+                                       capture_output=True, text=True)
+                if child.returncode != 0:
+                    print("{:<24} failed\n{}".format(key, child.stderr))
+                    continue
+                results[key] = json.loads(child.stdout.strip().splitlines()[-1])
+                result = results[key]
+                print("{:<24} {:9.3f}s {:14,.0f}/s  peak {:7.1f} MB (+{:.1f} MB in case)".format(
+                    key, result["seconds"], result["throughput"], result["peak_rss_mb"], result["case_rss_mb"]))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for key, (before, after) in regressions.items():
+            print("REGRESSION {}: {:.3f}s -> {:.3f}s".format(key, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import geopandas
+import osmapi
+from ingest import node_coordinates
+from locations import api_coordinates, save_coordinates
+from pipeline import HERE, Options, run
+from timetable import Timetable
+
+# Runs the toolbox's modes without ArcGIS, e.g.
+#   python cli.py fastest --features MercedCounty.feather --bus-database BusDatabase.feather --graphml Merced.graphml
+#   python cli.py scenarios scenarios.json --jobs 4
+#   python cli.py stops --osm-extract california-latest.osm.bz2
+# A scenarios file is a JSON list of objects with pipeline.Options keyword arguments and an optional "name"; they run
+# in parallel, each writing to its own folder, with the CPUs split between them.
+COMMANDS = {"fastest": "Fastest Mode", "travel-time": "Travel Time", "premium": "Public Transit Premium",
+            "over-time": "Transit Mode over Time", "walking-score": "Walking Score", "batch": "Batch Destinations",
+            "precompute": "Precompute Table"}
+
+
+def option_arguments():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--features", help="cleaned OSM features feather; without it the region is prepared and saved")
+    parser.add_argument("--osm-extract", nargs="+", default=[],
+                        help="local .osm/.osm.bz2/.osm.gz extracts to build the features from instead of downloading")
+    parser.add_argument("--bus-database", help="precomputed BusDatabase.feather")
+    parser.add_argument("--graphml", help="walk graph GraphML (its compiled .walkgraph is used when present)")
+    parser.add_argument("--region", help="place name to download instead of --bbox")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("XMIN", "YMIN", "XMAX", "YMAX"),
+                        default=[-120.593, 37.252, -120.337, 37.38])
+    parser.add_argument("--poi", default="n12162711342", help="OSM ID of the point of interest building")
+    parser.add_argument("--geocode", help="geocode this point of interest instead of using --poi")
+    parser.add_argument("--direction", choices=["Origin", "Destination"], default="Origin")
+    parser.add_argument("--modes", nargs="+", choices=["Walking", "UC Bus", "Merced Bus"],
+                        default=["Walking", "UC Bus", "Merced Bus"])
+    parser.add_argument("--days", nargs="+", choices=["Weekday", "Weekend"], default=["Weekday"])
+    parser.add_argument("--time", type=float, default=720,
+                        help="minutes since midnight, the time to arrive by with --direction Destination")
+    parser.add_argument("--max-transfers", type=int, default=2)
+    parser.add_argument("--window", type=float, nargs=3, metavar=("START", "END", "INTERVAL"),
+                        default=[360, 1320, 15])
+    parser.add_argument("--cache-mb", type=int, default=512)
+    parser.add_argument("--cache-folder")
+    parser.add_argument("--destinations", help="destination features file (anything geopandas reads)")
+    parser.add_argument("--destination-ids", nargs="+", default=[])
+    parser.add_argument("--layout", choices=["Wide", "Long"], default="Wide")
+    parser.add_argument("--nearest", action="store_true")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[5, 10, 15])
+    parser.add_argument("--weights", nargs="+", default=[], metavar="TAG=WEIGHT")
+    parser.add_argument("--output-folder")
+    parser.add_argument("--format", choices=["Parquet", "Feather"], default="Parquet")
+    parser.add_argument("--geojson", action="store_true")
+    parser.add_argument("--grid", choices=["Hexagon", "Square"],
+                        help="also summarise fastest and travel-time results on grid cells")
+    parser.add_argument("--grid-sizes", type=float, nargs="+", default=[250, 500, 1000], metavar="METRES")
+    parser.add_argument("--grid-raster", action="store_true", help="also write a tiled GeoTIFF of the smallest cells")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--profile", action="store_true", help="save a JSON trace to the output folder")
+    parser.add_argument("--schedules", help="schedules JSON, BusSchedules/schedules.json by default")
+    parser.add_argument("--stops", help="stop coordinates JSON, BusSchedules/stops.json by default")
+    return parser
+
+
+def destination_points(path: str):
+    # Named like the toolbox's destination features, with polygons and lines reduced to a point inside them
+    features = geopandas.read_file(path).to_crs(4326)
+    points = features.geometry.representative_point()
+    return {"fid" + str(index): (point.x, point.y) for index, point in points.items()}
+
+
+def options_from_args(args):
+    return Options(
+        mode=COMMANDS[args.command], features=args.features, bus_database=args.bus_database, graphml=args.graphml,
+        region_mode="Geocode Region" if args.region else "Use Bounding Box", region=args.region, bbox=args.bbox,
+        poi_mode="Geocode a Point of Interest" if args.geocode else "Specify Node ID", poi=args.poi,
+        poi_geocode=args.geocode, direction=args.direction, modes=args.modes, days=args.days, time_of_day=args.time,
+        max_transfers=args.max_transfers, window_start=args.window[0], window_end=args.window[1],
+        window_interval=args.window[2], cache_mb=args.cache_mb, cache_folder=args.cache_folder,
+        destination_points=destination_points(args.destinations) if args.destinations else None,
+        destination_ids=args.destination_ids, batch_layout=args.layout, batch_nearest=args.nearest,
+        score_thresholds=args.thresholds,
+        score_weights={tag.strip(): float(weight) for tag, weight in (item.split("=") for item in args.weights)},
+        output_folder=args.output_folder, output_format=args.format, geojson=args.geojson, chunk_size=args.chunk_size,
+        processes=args.processes, profile=args.profile, schedules=args.schedules, stops=args.stops,
+        osm_extracts=args.osm_extract, grid=args.grid, grid_sizes=args.grid_sizes, grid_raster=args.grid_raster)
+
+
+def write_stop_file(schedules: str, path: str, osm_extracts: [str]):
+    # Coordinates of every stop in the schedules, from local extracts or one OSM API request, so later runs resolve
+    # stops offline
+    stop_ids = Timetable.load(schedules).stop_ids
+    if osm_extracts:
+        coordinates = node_coordinates(osm_extracts, stop_ids)
+        missing = [stop_id for stop_id in stop_ids if stop_id not in coordinates]
+        if missing:
+            raise KeyError("Stops not in the extracts: " + ", ".join(missing))
+    else:
+        coordinates = api_coordinates(osmapi.OsmApi(), stop_ids)
+    save_coordinates(path, coordinates)
+    return path
+
+
+def run_scenario(name: str, kwargs: dict):
+    prefix = "[" + name + "] "
+    print(prefix + "Starting " + kwargs.get("mode", "Fastest Mode"), flush=True)
+    message = lambda text: print(prefix + text, flush=True)
+    return run(Options(**kwargs), message, lambda text: print(prefix + "WARNING " + text, file=sys.stderr, flush=True))
+
+
+def run_scenarios(path: str, jobs: int, output_folder: str):
+    with open(path) as f:
+        scenarios = json.load(f)
+    processes = max(1, (os.cpu_count() or 1) // jobs)
+    runs = {}
+    for i, scenario in enumerate(scenarios):
+        kwargs = dict(scenario)
+        name = str(kwargs.pop("name", i))
+        kwargs.setdefault("output_folder", os.path.join(output_folder, name))
+        kwargs.setdefault("processes", processes)
+        runs[name] = kwargs
+    failed = 0
+    # Scenario processes are not daemonic, so each can start its own routing pool
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {executor.submit(run_scenario, name, kwargs): name for name, kwargs in runs.items()}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                print("[" + futures[future] + "] Wrote " + ", ".join(future.result() or []), flush=True)
+            except Exception as error:
+                failed += 1
+                print("[" + futures[future] + "] Failed: " + repr(error), file=sys.stderr, flush=True)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merced public transit travel times without ArcGIS")
+    commands = parser.add_subparsers(dest="command", required=True)
+    options = option_arguments()
+    for command, mode in COMMANDS.items():
+        commands.add_parser(command, parents=[options], help=mode)
+    scenarios = commands.add_parser("scenarios", help="run a JSON list of scenarios in parallel")
+    scenarios.add_argument("path")
+    scenarios.add_argument("--jobs", type=int, default=1)
+    scenarios.add_argument("--output-folder", default=os.path.join(os.getcwd(), "scenarios"))
+    stops = commands.add_parser("stops", help="write the stop coordinate file for the schedules")
+    stops.add_argument("--schedules", default=os.path.join(HERE, "BusSchedules", "schedules.json"))
+    stops.add_argument("--stops", default=os.path.join(HERE, "BusSchedules", "stops.json"))
+    stops.add_argument("--osm-extract", nargs="+", default=[], help="read the stops from local extracts")
+    args = parser.parse_args(argv)
+    if args.command == "stops":
+        print("Wrote " + write_stop_file(args.schedules, args.stops, args.osm_extract))
+        return 0
+    if args.command == "scenarios":
+        return 1 if run_scenarios(args.path, args.jobs, args.output_folder) else 0
+    for path in run(options_from_args(args)):
+        print("Wrote " + path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import bz2
+import gzip
+import multiprocessing as mp
+import xml.parsers.expat
+from array import array
+import geopandas
+import numpy
+import pandas
+import shapely
+
+# Offline replacement for the features_from_place/features_from_bbox download: local OSM XML extracts (.osm, .osm.bz2
+# or .osm.gz, e.g. from Geofabrik or a tiled osmium extract) are streamed once each, keeping only node coordinates
+# and the tagged elements the toolbox uses, and cleaned tile by tile into the same table as MercedCounty.feather.
+FEATURE_TAGS = ("building", "leisure")
+ADDRESS_TAGS = ("addr:street", "addr:housenumber", "addr:postcode")
+
+
+def _open(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _wanted(tags: dict):
+    return any(tag in tags for tag in FEATURE_TAGS + ADDRESS_TAGS)
+
+
+def read_osm(path: str):
+    # Building, leisure and address features of one extract as a GeoDataFrame indexed by (element, id): nodes as
+    # points, closed ways as polygons and open ways as lines. Relations are skipped, as the download path drops
+    # them. Every node's coordinates are kept in flat arrays, since nodes come before the ways that use them, but
+    # only wanted elements keep their tags.
+    nodeids, lons, lats = array("q"), array("d"), array("d")
+    elements, ids, tags, refs, wayrefs = [], [], [], array("q"), array("q")
+    current = {"element": None, "tags": {}, "refs": []}
+
+    def start(name, attributes):
+        if name == "node":
+            nodeids.append(int(attributes["id"]))
+            lons.append(float(attributes["lon"]))
+            lats.append(float(attributes["lat"]))
+            current["element"], current["id"] = "node", int(attributes["id"])
+        elif name == "way":
+            current["element"], current["id"] = "way", int(attributes["id"])
+        elif name == "relation":
+            current["element"] = None
+        elif name == "tag" and current["element"] is not None:
+            current["tags"][attributes["k"]] = attributes["v"]
+        elif name == "nd" and current["element"] == "way":
+            current["refs"].append(int(attributes["ref"]))
+
+    def end(name):
+        if name not in ("node", "way", "relation"):
+            return
+        if current["element"] is not None and _wanted(current["tags"]):
+            elements.append(current["element"])
+            ids.append(current["id"])
+            tags.append(current["tags"])
+            if current["element"] == "way":
+                refs.extend(current["refs"])
+                wayrefs.append(len(current["refs"]))
+        current["element"], current["tags"], current["refs"] = None, {}, []
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    with _open(path) as f:
+        parser.ParseFile(f)
+    nodeids = numpy.frombuffer(nodeids, dtype=numpy.int64)
+    order = numpy.argsort(nodeids, kind="stable")
+    nodeids, lons, lats = nodeids[order], numpy.frombuffer(lons)[order], numpy.frombuffer(lats)[order]
+    isnode = numpy.array(elements) == "node"
+    geometry = numpy.empty(len(elements), dtype=object)
+    position = numpy.searchsorted(nodeids, numpy.asarray(ids, dtype=numpy.int64)[isnode])
+    geometry[isnode] = shapely.points(lons[position], lats[position])
+    geometry[~isnode] = _way_geometries(numpy.frombuffer(refs, dtype=numpy.int64),
+                                        numpy.frombuffer(wayrefs, dtype=numpy.int64), nodeids, lons, lats)
+    index = pandas.MultiIndex.from_arrays([elements, ids], names=["element", "id"])
+    gdf = geopandas.GeoDataFrame(pandas.DataFrame.from_records(tags, index=index), geometry=geometry, crs=4326)
+    return gdf[gdf.geometry.notna()]
+
+
+def node_coordinates(paths: [str], osm_ids: [str]):
+    # lon/lat of the given "n123" nodes from local extracts, for writing the bus stop file without the OSM API
+    wanted = {int(osm_id[1:]) for osm_id in osm_ids if osm_id[:1] == "n"}
+    found = {}
+
+    def start(name, attributes):
+        if name == "node" and int(attributes["id"]) in wanted:
+            found["n" + attributes["id"]] = (float(attributes["lon"]), float(attributes["lat"]))
+
+    for path in paths:
+        parser = xml.parsers.expat.ParserCreate()
+        parser.StartElementHandler = start
+        with _open(path) as f:
+            parser.ParseFile(f)
+    return found
+
+
+def _way_geometries(refs, counts, nodeids, lons, lats):
+    # Polygon for each closed way of at least four references, line for the rest, None for a way with fewer than
+    # two of its nodes in the extract. Built in one vectorised call per kind from the concatenated references.
+    way = numpy.repeat(numpy.arange(len(counts)), counts)
+    position = numpy.minimum(numpy.searchsorted(nodeids, refs), max(len(nodeids) - 1, 0))
+    found = nodeids[position] == refs if len(nodeids) else numpy.zeros(len(refs), dtype=bool)
+    way, position = way[found], position[found]
+    present = numpy.bincount(way, minlength=len(counts))
+    first = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]]).astype(int)
+    last = numpy.maximum(first + counts - 1, 0)
+    closed = (counts >= 4) & (present == counts)
+    closed[closed] = refs[first[closed]] == refs[last[closed]]
+    geometries = numpy.full(len(counts), None, dtype=object)
+    for kind, chosen in ((shapely.linearrings, closed), (shapely.linestrings, (present >= 2) & ~closed)):
+        keep = chosen[way]
+        if keep.any():
+            rows = numpy.unique(way[keep], return_inverse=True)[1].reshape(-1)
+            geometries[chosen] = kind(numpy.column_stack([lons[position[keep]], lats[position[keep]]]), indices=rows)
+    geometries[closed] = shapely.polygons(geometries[closed])
+    return geometries
+
+
+_tile = {}
+
+
+def _init_tile_worker(graph):
+    _tile["graph"] = graph
+
+
+def _clean_tile(task):
+    # Address points inside a way polygon of the tile, and the nearest graph node of every feature in the tile
+    x, y, ispoint, polygons = task
+    inside = numpy.zeros(len(x), dtype=bool)
+    if ispoint.any() and len(polygons):
+        points = numpy.flatnonzero(ispoint)
+        hits = shapely.STRtree(polygons).query(shapely.points(x[points], y[points]), predicate="within")
+        inside[points[numpy.unique(hits[0])]] = True
+    return inside, _tile["graph"].nearest_nodes(x, y)
+
+
+def clean_features(gdf: geopandas.GeoDataFrame, graph, processes: int = None, tiles: int = 4):
+    # Same cleaning as the toolbox has always done on downloaded features, as a table like MercedCounty.feather:
+    # duplicates dropped by (element, id), relations dropped, points inside a way polygon dropped (the polygon
+    # already stands for them), ways reduced to their centroid and everything snapped to its nearest walk graph
+    # node. The filter and the snapping run on a tiles x tiles grid, each tile with only the polygons that reach
+    # it, spread over a process pool.
+    gdf = gdf[~gdf.index.duplicated()]
+    gdf = gdf[gdf.index.get_level_values(0) != "relation"]
+    geometry = numpy.asarray(gdf.geometry.array)
+    centroids = shapely.centroid(geometry)
+    x, y = shapely.get_x(centroids), shapely.get_y(centroids)
+    ispoint = numpy.asarray(gdf.index.get_level_values(0) == "node")
+    polygons = numpy.flatnonzero(~ispoint & (shapely.get_type_id(geometry) == 3))
+    low = numpy.array([x.min(), y.min()]) if len(x) else numpy.zeros(2)
+    size = (numpy.array([x.max(), y.max()]) - low) / tiles + 1e-12 if len(x) else numpy.ones(2)
+    cell = numpy.minimum(((numpy.column_stack([x, y]) - low) / size).astype(int), tiles - 1)
+    cell = cell[:, 0] * tiles + cell[:, 1]
+    tree = shapely.STRtree(geometry[polygons])
+    tasks, members = [], []
+    for c in numpy.unique(cell):
+        rows = numpy.flatnonzero(cell == c)
+        i, j = divmod(int(c), tiles)
+        box = shapely.box(*(low + size * [i, j]), *(low + size * [i + 1, j + 1]))
+        tasks.append((x[rows], y[rows], ispoint[rows], geometry[polygons[tree.query(box)]]))
+        members.append(rows)
+    processes = min(processes or mp.cpu_count(), len(tasks))
+    if processes > 1:
+        with mp.Pool(processes, initializer=_init_tile_worker, initargs=(graph,)) as pool:
+            results = pool.map(_clean_tile, tasks, chunksize=1)
+    else:
+        _init_tile_worker(graph)
+        results = [_clean_tile(task) for task in tasks]
+    inside = numpy.zeros(len(gdf), dtype=bool)
+    nearest = numpy.zeros(len(gdf), dtype=numpy.int64)
+    for rows, (tileinside, tilenearest) in zip(members, results):
+        inside[rows] = tileinside
+        nearest[rows] = tilenearest
+    # Ways first, then the points left over, as the download path has always ordered them
+    keep = numpy.concatenate([numpy.flatnonzero(~ispoint), numpy.flatnonzero(ispoint & ~inside)])
+    gdfclean = geopandas.GeoDataFrame(gdf.iloc[keep].drop(columns=gdf.geometry.name),
+                                      geometry=centroids[keep], crs=gdf.crs)
+    gdfclean["nearestnode"] = nearest[keep]
+    return gdfclean.reset_index()
+
+
+def ingest_osm(paths: [str], graph, bbox: tuple = None, processes: int = None, tiles: int = 4):
+    # Cleaned features from one or more extracts, which may overlap (tiles of a larger region each cut with
+    # complete ways); each extract is read in its own process. bbox (xmin, ymin, xmax, ymax) keeps only features
+    # whose centroid falls inside it.
+    paths = list(paths)
+    if len(paths) > 1 and (processes or mp.cpu_count()) > 1:
+        with mp.Pool(min(processes or mp.cpu_count(), len(paths))) as pool:
+            parts = pool.map(read_osm, paths, chunksize=1)
+    else:
+        parts = [read_osm(path) for path in paths]
+    gdf = pandas.concat(parts) if len(parts) > 1 else parts[0]
+    if bbox is not None:
+        centroids = shapely.centroid(numpy.asarray(gdf.geometry.array))
+        gdf = gdf[shapely.contains_xy(shapely.box(*bbox), shapely.get_x(centroids), shapely.get_y(centroids))]
+    return clean_features(gdf, graph, processes, tiles)
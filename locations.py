@@ -0,0 +1,85 @@
+import json
+import os
+import numpy
+
+
+class LocationIndex:
+    # In-process lookup from an OSM ID ("n123", "w456") to its lon/lat and nearest walk graph node. Buildings come
+    # from the feature table and its nearestnode column; bus stop coordinates come from a JSON file next to the
+    # schedules. A stop missing from that file is fetched from the OSM API once and written back, so later runs
+    # resolve everything offline. Stop snaps are saved in the walk graph's cache folder with the graph's fingerprint
+    # and the coordinates they were computed from, so a recompiled graph or a moved stop is snapped again.
+    def __init__(self, path: str, graph, gdfclean=None, api=None):
+        self.path = path
+        self.graph = graph
+        self.api = api
+        self.coordinates = {}
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                self.coordinates = {osm_id: tuple(lonlat) for osm_id, lonlat in json.load(f).items()}
+        self.snap_path = os.path.join(graph.path, "stopnodes.json") if getattr(graph, "path", None) else None
+        self.fingerprint = graph.fingerprint() if hasattr(graph, "fingerprint") else None
+        self.snaps = {}
+        if self.snap_path is not None and os.path.isfile(self.snap_path):
+            with open(self.snap_path) as f:
+                snaps = json.load(f)
+            if isinstance(snaps, dict) and snaps.get("graph") == self.fingerprint:
+                self.snaps = {osm_id: node for osm_id, (lon, lat, node) in snaps["stops"].items()
+                              if self.coordinates.get(osm_id) == (lon, lat)}
+        self.buildings = {}
+        if gdfclean is not None:
+            keys = gdfclean["element"].str[0] + gdfclean["id"].astype(str)
+            self.buildings = dict(zip(keys.tolist(), gdfclean["nearestnode"].tolist()))
+
+    def node(self, osm_id: str):
+        return self.nodes([osm_id])[osm_id]
+
+    def nodes(self, osm_ids: [str]):
+        # Walk graph node for each ID. Buildings use the node they were matched to when the feature table was made,
+        # which is also the row busdatabase holds for them.
+        found = {}
+        missing = []
+        for osm_id in osm_ids:
+            if osm_id in self.snaps:
+                found[osm_id] = self.snaps[osm_id]
+            elif osm_id in self.buildings:
+                found[osm_id] = self.buildings[osm_id]
+            else:
+                missing.append(osm_id)
+        if missing:
+            self.fetch([osm_id for osm_id in missing if osm_id not in self.coordinates])
+            lonlat = numpy.array([self.coordinates[osm_id] for osm_id in missing], dtype=float)
+            for osm_id, node in zip(missing, self.graph.nearest_nodes(lonlat[:, 0], lonlat[:, 1]).tolist()):
+                self.snaps[osm_id] = node
+                found[osm_id] = node
+            if self.snap_path is not None:
+                with open(self.snap_path, "w") as f:
+                    json.dump({"graph": self.fingerprint, "stops": {osm_id: [*self.coordinates[osm_id], node]
+                                                                    for osm_id, node in self.snaps.items()}}, f)
+        return found
+
+    def fetch(self, osm_ids: [str]):
+        if not osm_ids:
+            return
+        if self.api is None:
+            raise KeyError("No coordinates for " + ", ".join(osm_ids) + " in " + self.path)
+        self.coordinates.update(api_coordinates(self.api, osm_ids, self.path))
+        save_coordinates(self.path, self.coordinates)
+
+
+def api_coordinates(api, osm_ids: [str], path: str = "the stop file"):
+    # lon/lat of OSM nodes from one batched API request
+    for osm_id in osm_ids:
+        if osm_id[0] != "n":
+            raise KeyError(osm_id + " is not a building in the feature table or a node in " + path)
+    nodes = api.NodesGet([int(osm_id[1:]) for osm_id in osm_ids]) if osm_ids else {}
+    missing = [osm_id for osm_id in osm_ids if int(osm_id[1:]) not in nodes]
+    if missing:
+        raise KeyError("OSM has no node " + ", ".join(missing))
+    return {osm_id: (nodes[int(osm_id[1:])]["lon"], nodes[int(osm_id[1:])]["lat"]) for osm_id in osm_ids}
+
+
+def save_coordinates(path: str, coordinates: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({osm_id: list(lonlat) for osm_id, lonlat in sorted(coordinates.items())}, f, indent=0)
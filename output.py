@@ -0,0 +1,117 @@
+import json
+import os
+import geopandas
+import numpy
+import pandas
+import pyarrow
+import pyarrow.ipc
+import pyarrow.parquet
+
+
+def spatial_order(gdfclean: geopandas.GeoDataFrame):
+    # Z-order of the features' bounding box centres, so runs of consecutive rows, and therefore chunks, are
+    # spatially compact
+    bounds = gdfclean.geometry.bounds.to_numpy()
+    points = (bounds[:, :2] + bounds[:, 2:]) / 2
+    low, high = numpy.nanmin(points, axis=0), numpy.nanmax(points, axis=0)
+    cells = numpy.nan_to_num((points - low) / numpy.maximum(high - low, 1e-12) * 65535).astype(numpy.uint64)
+    return numpy.argsort(_spread(cells[:, 0]) | (_spread(cells[:, 1]) << numpy.uint64(1)), kind="stable")
+
+
+def _spread(values):
+    # Puts a zero bit between each of the low 16 bits, for interleaving x and y into a Morton code
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)):
+        values = (values | (values << numpy.uint64(shift))) & numpy.uint64(mask)
+    return values
+
+
+class ChunkedWriter:
+    # Appends GeoDataFrame chunks to one GeoParquet (a row group per chunk) or feather file (a record batch per
+    # chunk) as they are produced, optionally mirrored to GeoJSON one feature at a time. Only the current chunk
+    # is ever held in memory. Text columns are always written as strings so a chunk where every value happens to
+    # be missing does not change the schema.
+    def __init__(self, path: str, geojson: bool = False):
+        self.path = path
+        self.geojson_path = os.path.splitext(path)[0] + ".geojson" if geojson else None
+        self._writer = None
+        self._schema = None
+        self._geojson = None
+        self._features = 0
+        self.rows = 0
+
+    def write(self, chunk: geopandas.GeoDataFrame):
+        geometry = chunk.geometry.name
+        attributes = pandas.DataFrame(chunk.drop(columns=geometry))
+        if self._schema is None:
+            fields = [pyarrow.field(name, pyarrow.string() if pandas.api.types.is_string_dtype(dtype)
+                                    else pyarrow.from_numpy_dtype(dtype)) for name, dtype in attributes.dtypes.items()]
+            fields.append(pyarrow.field(geometry, pyarrow.binary()))
+            geo = {"version": "1.0.0", "primary_column": geometry,
+                   "columns": {geometry: {"encoding": "WKB", "geometry_types": [],
+                                          "crs": chunk.crs.to_json_dict() if chunk.crs is not None else None}}}
+            self._schema = pyarrow.schema(fields, metadata={b"geo": json.dumps(geo).encode()})
+            if self.path.endswith(".parquet"):
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pyarrow.ipc.new_file(self.path, self._schema)
+        arrays = [pyarrow.array(attributes[field.name].to_numpy(), type=field.type, from_pandas=True)
+                  for field in self._schema if field.name != geometry]
+        arrays.append(pyarrow.array(chunk.geometry.to_wkb(), type=pyarrow.binary()))
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+        if self.geojson_path is not None:
+            self._write_geojson(chunk.to_crs(4326) if chunk.crs is not None else chunk)
+        self.rows += len(chunk)
+
+    def _write_geojson(self, chunk: geopandas.GeoDataFrame):
+        if self._geojson is None:
+            self._geojson = open(self.geojson_path, "w", encoding="utf-8")
+            self._geojson.write('{"type": "FeatureCollection", "features": [\n')
+        for feature in chunk.iterfeatures(na="null", show_bbox=False):
+            self._geojson.write((",\n" if self._features else "") + json.dumps(feature, default=_json_value))
+            self._features += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._geojson is not None:
+            self._geojson.write("\n]}\n")
+            self._geojson.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, numpy.generic) else str(value)
+
+
+def stream_output(writer: ChunkedWriter, gdfclean: geopandas.GeoDataFrame, order, chunk_size: int, compute):
+    # Runs compute(start, stop) for each chunk of rows order[start:stop] and appends those features with the
+    # returned result columns (a dict of arrays or a DataFrame, by position) to writer
+    for start in range(0, len(order), chunk_size):
+        stop = min(start + chunk_size, len(order))
+        chunk = gdfclean.iloc[order[start:stop]]
+        columns = pandas.DataFrame(compute(start, stop)).set_axis(chunk.index)
+        writer.write(pandas.concat([chunk, columns], axis=1))
+
+
+def read_columns(path: str, names: [str]):
+    # Some columns of a file ChunkedWriter wrote, in the order the rows were written
+    if path.endswith(".parquet"):
+        return pyarrow.parquet.read_table(path, columns=names).to_pandas()
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all().select(names).to_pandas()
+
+
+def write_columns(path: str, gdfclean: geopandas.GeoDataFrame, columns, chunk_size: int = 4096,
+                  geojson: bool = False):
+    # Writes already computed per-building columns (a dict of arrays or a DataFrame in gdfclean's row order)
+    # chunk by chunk in spatial order, without building a full copy of the feature table
+    columns = {name: numpy.asarray(values) for name, values in pandas.DataFrame(columns).items()}
+    order = spatial_order(gdfclean)
+    with ChunkedWriter(path, geojson) as writer:
+        stream_output(writer, gdfclean, order, chunk_size,
+                      lambda start, stop: {name: values[order[start:stop]] for name, values in columns.items()})
+    return writer
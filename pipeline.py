@@ -0,0 +1,415 @@
+import contextlib
+import os
+import time
+import geopandas
+import osmapi
+import osmnx
+import numpy
+import pandas
+from aggregate import write_grids
+from batch import batch_table, batch_travel_times
+from ingest import ADDRESS_TAGS, FEATURE_TAGS, clean_features, ingest_osm
+from locations import LocationIndex
+from output import ChunkedWriter, read_columns, spatial_order, stream_output, write_columns
+from pointquery import PointIndex
+from profiling import Profiler, profiling
+from raptor import Raptor, transfer_times
+from resultcache import ResultCache, file_fingerprint
+from timetable import Timetable
+from utils import building_keys, node_key, transit_premium
+from walkgraph import WalkGraph, load_walk_graph
+from walking import node_walk_times, precompute_walk_table, walk_times_to_node
+from walkmatrix import WalkMatrix, load_walk_matrix
+from walkscore import category_weights, walking_score
+from workers import TravelTimePool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODES = ("Fastest Mode", "Travel Time", "Public Transit Premium", "Transit Mode over Time", "Walking Score",
+         "Batch Destinations", "Precompute Table")
+
+
+class Options:
+    # Everything one run needs as plain values, so runs can be driven from the toolbox, the command line or other
+    # Python code. Attributes follow the toolbox parameters. With features, bus_database and graphml set the run
+    # uses those precomputed files; without them it prepares the region (from local OSM extracts in osm_extracts,
+    # or downloaded from OSM) and stops after saving it.
+    def __init__(self, mode: str = "Fastest Mode", features: str = None, bus_database: str = None,
+                 graphml: str = None, region_mode: str = "Use Bounding Box",
+                 region: str = "Merced, Merced County, California, USA",
+                 bbox: tuple = (-120.593, 37.252, -120.337, 37.38), poi_mode: str = "Specify Node ID",
+                 poi: str = "n12162711342", poi_geocode: str = None, direction: str = "Origin",
+                 modes: [str] = ("Walking", "UC Bus", "Merced Bus"), days: [str] = ("Weekday",),
+                 time_of_day: float = 720, max_transfers: int = 2, window_start: float = 360,
+                 window_end: float = 1320, window_interval: float = 15, cache_mb: int = 512,
+                 cache_folder: str = None, destination_points: dict = None, destination_ids: [str] = None,
+                 batch_layout: str = "Wide", batch_nearest: bool = False,
+                 score_thresholds: [float] = (5, 10, 15), score_weights: dict = None, output_folder: str = None,
+                 output_format: str = "Parquet", geojson: bool = False, chunk_size: int = 4096,
+                 processes: int = None, profile: bool = False, schedules: str = None, stops: str = None,
+                 osm_extracts: [str] = None, grid: str = None, grid_sizes: [float] = (250, 500, 1000),
+                 grid_raster: bool = False):
+        if mode not in MODES:
+            raise ValueError("Unknown mode " + repr(mode) + ", expected one of " + ", ".join(MODES))
+        self.mode = mode
+        self.features = features
+        self.bus_database = bus_database
+        self.graphml = graphml
+        self.region_mode = region_mode
+        self.region = region
+        self.bbox = tuple(bbox) if bbox is not None else None
+        self.poi_mode = poi_mode
+        self.poi = poi
+        self.poi_geocode = poi_geocode
+        self.direction = direction
+        self.modes = list(modes)
+        self.days = list(days)
+        self.time_of_day = time_of_day
+        self.max_transfers = max_transfers
+        self.window_start = window_start
+        self.window_end = window_end
+        self.window_interval = window_interval
+        self.cache_mb = cache_mb
+        self.cache_folder = cache_folder or os.path.join(os.getcwd(), "ResultCache")
+        self.destination_points = dict(destination_points or {})
+        self.destination_ids = list(destination_ids or [])
+        self.batch_layout = batch_layout
+        self.batch_nearest = batch_nearest
+        self.score_thresholds = sorted(score_thresholds)
+        self.score_weights = dict(score_weights or {})
+        self.output_folder = output_folder or os.getcwd()
+        self.output_format = output_format
+        self.geojson = geojson
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.profile = profile
+        self.schedules = schedules or os.path.join(HERE, "BusSchedules", "schedules.json")
+        self.stops = stops or os.path.join(HERE, "BusSchedules", "stops.json")
+        self.osm_extracts = list(osm_extracts or [])
+        self.grid = grid if grid != "None" else None
+        self.grid_sizes = sorted(grid_sizes)
+        self.grid_raster = grid_raster
+
+    @property
+    def precomputed(self):
+        return self.features is not None
+
+    @property
+    def extension(self):
+        return ".feather" if self.output_format == "Feather" else ".parquet"
+
+    def output_path(self, name: str):
+        return os.path.join(self.output_folder, name + self.extension)
+
+
+def run(options: Options, message=print, warning=print, progressor=None):
+    # Runs options.mode and returns the paths it wrote. message and warning take one string each; progressor, if
+    # given, is called as progressor(label, position, total) like profiling.Profiler's. With options.profile the
+    # stage timings and counters are also saved to trace.json in the output folder.
+    profiler = Profiler(options.profile, message, progressor)
+    os.makedirs(options.output_folder, exist_ok=True)
+    with profiling(profiler):
+        try:
+            return _run(options, profiler, message, warning)
+        finally:
+            profiler.stage()
+            profiler.save(os.path.join(options.output_folder, "trace.json"))
+
+
+def prepare_region(options: Options, profiler: Profiler, message=print):
+    # Walk graph and cleaned building/point features for the region. The graph is options.graphml when given and
+    # is otherwise downloaded and saved as GraphML and a compiled walk graph. Features are read offline from
+    # options.osm_extracts when given and otherwise downloaded; either way they are saved as a feature feather in
+    # the output folder.
+    paths = []
+    if options.graphml is not None:
+        profiler.stage("Load walk graph")
+        graph = load_walk_graph(options.graphml)
+    else:
+        profiler.stage("Download walk graph")
+        if options.region_mode == "Use Bounding Box":
+            graph = osmnx.graph_from_bbox(options.bbox, network_type='walk', simplify=True)
+            name = "_".join(str(value) for value in options.bbox)
+        else:
+            graph = osmnx.graph_from_place(options.region, network_type='walk', simplify=True)
+            name = options.region
+        graphml_path = os.path.join(options.output_folder, name + ".graphml")
+        osmnx.io.save_graphml(graph, graphml_path)
+        graph = WalkGraph.from_networkx(graph)
+        graph.save(os.path.splitext(graphml_path)[0] + ".walkgraph")
+        paths.append(graphml_path)
+    message("Graph Loaded")
+    if options.osm_extracts:
+        profiler.stage("Read OSM extracts")
+        bbox = options.bbox if options.region_mode == "Use Bounding Box" else None
+        gdfclean = ingest_osm(options.osm_extracts, graph, bbox, options.processes)
+    else:
+        profiler.stage("Download features")
+        tags = dict.fromkeys(FEATURE_TAGS, True)
+        addresstags = dict.fromkeys(ADDRESS_TAGS, True)
+        if options.region_mode == "Use Bounding Box":
+            buildingsgdf = osmnx.features_from_bbox(options.bbox, tags)
+            addressgdf = osmnx.features_from_bbox(options.bbox, addresstags)
+        else:
+            buildingsgdf = osmnx.features_from_place(options.region, tags)
+            addressgdf = osmnx.features_from_place(options.region, addresstags)
+        profiler.stage("Clean features")
+        gdfclean = clean_features(pandas.concat([buildingsgdf, addressgdf], axis=0), graph, options.processes)
+    profiler.count("buildings", len(gdfclean))
+    featurespath = os.path.join(options.output_folder, "MercedCounty.feather")
+    gdfclean.to_feather(featurespath)
+    message("OSM Features Loaded")
+    return paths + [featurespath]
+
+
+def selected_routes(timetable: Timetable, options: Options):
+    routes = []
+    for days in ("Weekday", "Weekend"):
+        if days in options.days:
+            routes += timetable.routes(days)
+    selectedroutes = []
+    for mode, operater in [("UC Bus", "UC Merced"), ("Merced Bus", "Merced Bus")]:
+        if mode in options.modes:
+            selectedroutes += [route for route in routes if route.operater == operater]
+    return selectedroutes
+
+
+def _run(options: Options, profiler: Profiler, message, warning):
+    profiler.stage("Load timetable")
+    timetable = Timetable.load(options.schedules)
+    for text in timetable.warnings:
+        warning(text)
+    message("Routes Loaded")
+    if not options.precomputed:
+        return prepare_region(options, profiler, message)
+    profiler.stage("Load walk graph")
+    graph = load_walk_graph(options.graphml)
+    if options.mode != "Precompute Table":
+        profiler.stage("Load walk matrix")
+        walkmatrix = load_walk_matrix(options.bus_database)
+    profiler.stage("Load features")
+    gdfclean = geopandas.read_feather(options.features)
+    profiler.count("buildings", len(gdfclean))
+    locations = LocationIndex(options.stops, graph, gdfclean, osmapi.OsmApi())
+    if options.mode == "Precompute Table":
+        profiler.stage("Precompute walk table")
+        stops = list(dict.fromkeys(stop.OSM_ID for route in timetable.routes() for stop in route.stops))
+        coordinates = gdfclean.geometry.get_coordinates(ignore_index=True)
+        gdfclean["nearestnode"] = graph.nearest_nodes(coordinates.x, coordinates.y)
+        stop_nodes = locations.nodes(stops)
+        busdatabase = precompute_walk_table(graph, gdfclean, stop_nodes, os.path.join(options.output_folder, "BusDatabaseCheckpoint"), options.processes, callback=message)
+        paths = [os.path.join(options.output_folder, name) for name in ("BusDatabase.feather", "BusDatabase.walkmatrix", "PointIndex.npz")]
+        busdatabase.to_feather(paths[0])
+        WalkMatrix.from_table(busdatabase, stops).save(paths[1])
+        message("Bus Database Saved")
+        profiler.stage("Build point query index")
+        PointIndex.build(timetable, busdatabase).save(paths[2])
+        message("Point Query Index Saved")
+        return paths
+    if options.mode == "Walking Score":
+        profiler.stage("Walking Score")
+        started = time.perf_counter()
+        scores = walking_score(graph, gdfclean["nearestnode"], category_weights(gdfclean, options.score_weights), options.score_thresholds, options.processes)
+        message("Walking Score calculated for {} features in {:.1f}s".format(len(gdfclean), time.perf_counter() - started))
+        columns = {"Walking Score {:g} min".format(threshold): scores[:, i] for i, threshold in enumerate(options.score_thresholds)}
+        write_columns(options.output_path("walkingscore"), gdfclean, columns, options.chunk_size, options.geojson)
+        return [options.output_path("walkingscore")]
+    selectedroutes = selected_routes(timetable, options)
+    # Checked before any walking is computed, since both modes need buses
+    if options.mode in ("Transit Mode over Time", "Public Transit Premium") and not selectedroutes:
+        warning(options.mode + " needs at least one bus mode and day selected")
+        return []
+    stop_ids = list(dict.fromkeys(stop.OSM_ID for route in selectedroutes for stop in route.stops))
+    buildingwalk = walkmatrix.walk(building_keys(gdfclean), stop_ids)
+    origin = options.direction == "Origin"
+    if options.mode == "Batch Destinations":
+        profiler.stage("Batch Destinations")
+        started = time.perf_counter()
+        destinations = {name: graph.nearest_nodes(x, y) for name, (x, y) in options.destination_points.items()}
+        destinations.update(locations.nodes(options.destination_ids))
+        message("{} destinations".format(len(destinations)))
+        raptor = Raptor(selectedroutes, stop_ids, transfer_times(buildingwalk)) if selectedroutes else None
+        stop_nodes = locations.nodes(stop_ids)
+        times = batch_travel_times(graph, gdfclean["nearestnode"], destinations, [stop_nodes[stop_id] for stop_id in stop_ids], buildingwalk, raptor, options.time_of_day, origin=origin, max_transfers=options.max_transfers, walking="Walking" in options.modes)
+        message("{:.1f} destinations per second".format(len(destinations) / (time.perf_counter() - started)))
+        table = batch_table(times, list(destinations), gdfclean.index, options.batch_layout, options.batch_nearest)
+        path = options.output_path("batchdestinations")
+        if options.batch_layout == "Long" and not options.batch_nearest:
+            table = gdfclean[["element", "id"]].loc[table.index].reset_index(drop=True).join(table.reset_index(drop=True))
+            if options.extension == ".feather":
+                table.to_feather(path)
+            else:
+                table.to_parquet(path)
+        else:
+            write_columns(path, gdfclean, table, options.chunk_size, options.geojson)
+        message("Batch Destinations Saved")
+        return [path]
+    message("Calculating Desination Nodes")
+    profiler.stage("Destination")
+    if options.poi_mode == "Specify Node ID":
+        destination_node = options.poi
+        destination_node_graph = locations.node(options.poi)
+    else:
+        geocoderesults = osmnx.geocoder.geocode_to_gdf(options.poi_geocode)
+        destination_node = geocoderesults["osm_type"][0][0] + str(geocoderesults["osm_id"][0])
+        destination_node_graph = graph.nearest_nodes(geocoderesults["lon"][0], geocoderesults["lat"][0])
+    columns = {}
+    message("Destination Node Calculated")
+    destinationwalk = walkmatrix.building_walk(node_key(destination_node), stop_ids)
+    cache = ResultCache(options.cache_folder, options.cache_mb * 1024 ** 2)
+    cached = None
+    if options.mode == "Fastest Mode":
+        # Keyed by the selected routes' own hashes, so editing a route that is not selected keeps the cached result.
+        # The walks and the graph are keyed by the hashes saved with the walk matrix and the compiled graph, and the
+        # features by their file, so a lookup never hashes the inputs themselves.
+        routehashes = timetable.route_hashes()
+        selectedhashes = [routehashes[(route.operatingdays, route.route_name)] for route in selectedroutes]
+        features = file_fingerprint(options.features)
+        cachekey = cache.key(destination=destination_node, destination_node=destination_node_graph, time_of_day=options.time_of_day, days=sorted(options.days), modes=sorted(options.modes), direction=options.direction, max_transfers=options.max_transfers, routes=selectedhashes, features=features, walk=walkmatrix.digest(stop_ids), graph=graph.digest())
+        cached = cache.get(cachekey)
+    methods = []
+    walkseconds = None
+    if ("Walking" in options.modes or options.mode == "Public Transit Premium") and cached is None:
+        message("Walking Distance Calculation Starting")
+        profiler.stage("Walking")
+        if options.mode == "Fastest Mode":
+            # Only the search is kept; Fastest Mode looks its buildings up in it a chunk at a time
+            walkseconds = graph.walk_seconds(destination_node_graph)
+        else:
+            columns["Walking"] = walk_times_to_node(graph, gdfclean["nearestnode"], destination_node_graph) / 60
+        methods.append("Walking")
+        message("Walking Distance Calculated")
+    clock = "{:d}{:02d}".format(int(options.time_of_day // 60), int(options.time_of_day % 60))
+    if options.mode == "Travel Time":
+        profiler.stage("Travel Time")
+        if selectedroutes:
+            raptor = Raptor(selectedroutes, stop_ids, transfer_times(buildingwalk))
+            columns.update(raptor.travel_times(buildingwalk, destinationwalk, options.time_of_day, origin=origin, max_transfers=options.max_transfers))
+        write_columns(options.output_path("traveltime" + clock), gdfclean, columns, options.chunk_size, options.geojson)
+        paths = [options.output_path("traveltime" + clock)]
+        if options.grid is not None and ("Walking" in columns or "Transit" in columns):
+            table = pandas.DataFrame({name: columns[name] for name in ("Walking", "Transit") if name in columns})
+            modes = table.idxmin(axis=1).to_numpy(dtype=object)
+            if "Transit" in columns:
+                modes[modes == "Transit"] = numpy.asarray(columns["Transit Routes"], dtype=object)[modes == "Transit"]
+            paths += grid_layers(options, "traveltime" + clock, gdfclean, table.min(axis=1), modes, profiler, message)
+        return paths
+    if options.mode == "Transit Mode over Time":
+        profiler.stage("Transit Mode over Time")
+        raptor = Raptor(selectedroutes, stop_ids, transfer_times(buildingwalk))
+        departures, traveltimes, modes, summary = raptor.profile(buildingwalk, destinationwalk, options.window_start, options.window_end, options.window_interval, origin=origin, max_transfers=options.max_transfers, walking=columns.get("Walking"))
+        message("{} departure times calculated".format(len(departures)))
+        for t, minute in enumerate(departures):
+            columns["t{:02d}{:02d}".format(int(minute // 60), int(minute % 60))] = traveltimes[:, t]
+        columns.update(summary)
+        write_columns(options.output_path("transitmodeovertime"), gdfclean, columns, options.chunk_size, options.geojson)
+        return [options.output_path("transitmodeovertime")]
+    if options.mode == "Public Transit Premium":
+        profiler.stage("Public Transit Premium")
+        raptor = Raptor(selectedroutes, stop_ids, transfer_times(buildingwalk))
+        transit = raptor.travel_times(buildingwalk, destinationwalk, options.time_of_day, origin=origin, max_transfers=options.max_transfers)
+        transit.update(transit_premium(columns["Walking"], transit["Transit"]))
+        columns.update(transit)
+        message("Public Transit Premium Calculated")
+        write_columns(options.output_path("publictransitpremium"), gdfclean, columns, options.chunk_size, options.geojson)
+        return [options.output_path("publictransitpremium")]
+    profiler.stage("Fastest Mode")
+    outputpath = options.output_path("fastestmode" + clock)
+    order = spatial_order(gdfclean)
+    if cached is not None:
+        with ChunkedWriter(outputpath, options.geojson) as writer:
+            stream_output(writer, gdfclean, order, options.chunk_size, lambda start, stop: cached.rows(order[start:stop]))
+        message("Results Loaded From Cache")
+    else:
+        fastest_mode(options, gdfclean, graph, walkmatrix, features, cache, cachekey, selectedroutes, selectedhashes, stop_ids, buildingwalk, destinationwalk, destination_node, destination_node_graph, walkseconds, order, methods, outputpath, profiler, message)
+    message("Fastest Mode Saved to " + outputpath)
+    if options.grid is None:
+        return [outputpath]
+    # Read back from the output, which is in spatial order, rather than kept in memory while routing
+    written = read_columns(outputpath, ["fastest_route", "fastest_route_method"])
+    times, modes = numpy.empty(len(order)), numpy.empty(len(order), dtype=object)
+    times[order] = written["fastest_route"].to_numpy(dtype=float)
+    modes[order] = written["fastest_route_method"].to_numpy(dtype=object)
+    return [outputpath] + grid_layers(options, "fastestmode" + clock, gdfclean, times, modes, profiler, message)
+
+
+def grid_layers(options: Options, name: str, gdfclean, times, modes, profiler: Profiler, message=print):
+    # Cell summaries of one output at each of options.grid_sizes, next to the per-building output
+    profiler.stage("Aggregate to grid")
+    paths = write_grids(os.path.join(options.output_folder, name), gdfclean, times, modes, options.grid, options.grid_sizes, options.grid_raster, options.extension, options.geojson)
+    message("{} grid layers saved for {} buildings".format(len(paths), len(gdfclean)))
+    return paths
+
+
+def fastest_mode(options: Options, gdfclean, graph, walkmatrix: WalkMatrix, features, cache: ResultCache,
+                 cachekey: str, selectedroutes, selectedhashes, stop_ids, buildingwalk, destinationwalk,
+                 destination_node: str, destination_node_graph, walkseconds, order, methods: [str], outputpath: str,
+                 profiler: Profiler, message=print):
+    # Buildings are routed chunk by chunk in spatial order; the rows of the walk matrix are put in that order so
+    # each chunk is one contiguous range. Each chunk goes straight to the output and to the cache entries, so only
+    # one chunk of results is held at a time. walkseconds is the walk search to the destination, None without Walking.
+    origin = options.direction == "Origin"
+    transitcolumns = ["Transit", "Transit Routes", "Transit Transfers"] + ([] if origin else ["Transit Departure"])
+    orderedwalk = buildingwalk[order]
+    nearestnode = gdfclean["nearestnode"].to_numpy()
+    methods = methods + [route.route_name for route in selectedroutes] + (["Transit"] if selectedroutes else [])
+    # A route's column only depends on that route's schedule and the walks to its own stops, so after a schedule
+    # change only the changed routes are routed again
+    routekeys = {}
+    for route, routehash in zip(selectedroutes, selectedhashes):
+        routekeys[route.route_name] = cache.key(route=routehash, destination=destination_node, destination_node=destination_node_graph, time_of_day=options.time_of_day, direction=options.direction, features=features, walk=walkmatrix.digest([stop.OSM_ID for stop in route.stops]))
+    transitkey = cache.key(routes=selectedhashes, destination=destination_node, destination_node=destination_node_graph, time_of_day=options.time_of_day, direction=options.direction, max_transfers=options.max_transfers, features=features, walk=walkmatrix.digest(stop_ids))
+    reused = {}
+    for name, key in list(routekeys.items()) + ([("Transit", transitkey)] if selectedroutes else []):
+        hit = cache.get(key)
+        if hit is not None:
+            reused.update({column: hit for column in hit.columns})
+    missingroutes = [route for route in selectedroutes if route.route_name not in reused]
+    raptor = Raptor(selectedroutes, stop_ids, transfer_times(buildingwalk)) if selectedroutes and "Transit" not in reused else None
+    message("{} of {} routes reused from earlier runs".format(len(selectedroutes) - len(missingroutes), len(selectedroutes)))
+
+    def fastest_chunk(start, stop):
+        rows = order[start:stop]
+        chunk = pandas.DataFrame({"Walking": node_walk_times(graph, walkseconds, nearestnode[rows]) / 60} if walkseconds is not None else {})
+        routetimes = pool.route_times(destinationwalk, options.time_of_day, origin=origin, start=start, stop=stop) if pool is not None else {}
+        for route in selectedroutes:
+            chunk[route.route_name] = routetimes[route.route_name] if route.route_name in routetimes else reused[route.route_name].rows(rows, [route.route_name])[route.route_name].to_numpy()
+        if raptor is not None:
+            for name, values in raptor.travel_times(orderedwalk[start:stop], destinationwalk, options.time_of_day, origin=origin, max_transfers=options.max_transfers).items():
+                chunk[name] = values
+        elif selectedroutes:
+            for name, values in reused["Transit"].rows(rows, transitcolumns).items():
+                chunk[name] = values.to_numpy()
+        chunk["fastest_route"] = chunk[methods].min(axis=1)
+        chunk["fastest_route_method"] = chunk[methods].idxmin(axis=1)
+        if "Transit" in methods:
+            fastesttransit = chunk["fastest_route_method"] == "Transit"
+            chunk.loc[fastesttransit, "fastest_route_method"] = chunk.loc[fastesttransit, "Transit Routes"]
+        for route in missingroutes:
+            writers[route.route_name].write(rows, chunk[[route.route_name]])
+        if raptor is not None:
+            writers["Transit"].write(rows, chunk[transitcolumns])
+        writers[None].write(rows, chunk)
+        message("{} of {} buildings routed".format(stop, len(order)))
+        profiler.progress("Routing buildings", stop, len(order))
+        return chunk
+
+    pool = TravelTimePool(orderedwalk, stop_ids, missingroutes, options.processes) if missingroutes else None
+    try:
+        if pool is not None:
+            message("Worker pool started in {:.2f}s, {} bytes shared, {} bytes pickled".format(pool.stats["startup_seconds"], pool.stats["shared_bytes"], pool.stats["initializer_bytes"]))
+        profiler.progress("Routing buildings", 0, len(order))
+        started = time.perf_counter()
+        # The cache entries are only kept when every chunk was written
+        with contextlib.ExitStack() as stack:
+            writers = {route.route_name: stack.enter_context(cache.writer(routekeys[route.route_name])) for route in missingroutes}
+            if raptor is not None:
+                writers["Transit"] = stack.enter_context(cache.writer(transitkey))
+            writers[None] = stack.enter_context(cache.writer(cachekey))
+            with ChunkedWriter(outputpath, options.geojson) as writer:
+                stream_output(writer, gdfclean, order, options.chunk_size, fastest_chunk)
+        profiler.rate("buildings_per_second", len(order), time.perf_counter() - started)
+        if pool is not None:
+            message("{} route tasks sent, {} bytes pickled".format(pool.stats["tasks"], pool.stats["task_bytes"]))
+    finally:
+        if pool is not None:
+            pool.close()
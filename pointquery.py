@@ -0,0 +1,126 @@
+import http.server
+import json
+import sys
+import urllib.parse
+import numpy
+from raptor import Raptor, transfer_times
+
+
+class PointIndex:
+    # Point-to-point transit queries from precomputed tables. For each day type, stop p's departures are
+    # times[offsets[p]:offsets[p + 1]] and row offsets[p] + i of arrivals is the earliest arrival at every stop, with
+    # at least one ride, for someone standing at p who catches departure i. Each graph node keeps its walk to the
+    # stops within max_walk seconds, nodes[k]'s stops being nearstops[indptr[k]:indptr[k + 1]].
+    days = ("Weekday", "Weekend")
+    stop_key = 10000
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.stop_ids = arrays["stop_ids"].tolist()
+        self.nodes = arrays["nodes"]
+        self.indptr = arrays["indptr"]
+        self.nearstops = arrays["nearstops"]
+        self.nearminutes = arrays["nearseconds"].astype(float) / 60
+        self.tables = {}
+        for day in self.days:
+            # Times keyed by stop so one searchsorted finds the next departure at several stops at once; stop_key is
+            # above any minute the timetable accepts
+            offsets = arrays[day + "_offsets"]
+            stops = numpy.repeat(numpy.arange(len(self.stop_ids)), numpy.diff(offsets))
+            self.tables[day] = (stops * self.stop_key + arrays[day + "_times"], offsets, arrays[day + "_arrivals"])
+        self.buildings = dict(zip(arrays["building_ids"].tolist(), arrays["building_nodes"].tolist()))
+
+    @classmethod
+    def build(cls, timetable, busdatabase, max_transfers: int = 2, max_walk: float = 900):
+        # busdatabase is the precomputed building-by-stop walk table with its nearestnode column
+        stop_ids = timetable.stop_ids
+        walk = busdatabase[stop_ids].to_numpy(dtype=float)
+        transfers = transfer_times(walk)
+        arrays = {"stop_ids": numpy.array(stop_ids)}
+        for day in cls.days:
+            raptor = Raptor(timetable.routes(day), stop_ids, transfers)
+            events = [times for times, first in raptor.departure_events(-numpy.inf)]
+            offsets = numpy.cumsum([0] + [len(times) for times in events])
+            initial = numpy.full((offsets[-1], len(stop_ids)), numpy.inf)
+            for p, times in enumerate(events):
+                labels = numpy.concatenate([[-numpy.inf], times])[:len(times)]
+                initial[numpy.arange(offsets[p], offsets[p + 1]), p] = labels
+            arrays[day + "_offsets"] = offsets
+            arrays[day + "_times"] = numpy.concatenate(events) if events else numpy.zeros(0)
+            arrays[day + "_arrivals"] = raptor.run(initial, max_transfers).transit.astype(numpy.float32)
+        nodes, first = numpy.unique(busdatabase["nearestnode"].to_numpy(), return_index=True)
+        nodewalk = walk[first]
+        near = nodewalk <= max_walk
+        rows, columns = numpy.nonzero(near)
+        arrays["nodes"] = nodes
+        arrays["indptr"] = numpy.concatenate([[0], numpy.cumsum(near.sum(axis=1))])
+        arrays["nearstops"] = columns.astype(numpy.int32)
+        arrays["nearseconds"] = nodewalk[rows, columns].astype(numpy.float32)
+        elements = busdatabase.index.get_level_values(0).astype(str).str[0]
+        arrays["building_ids"] = numpy.array(elements + busdatabase.index.get_level_values(1).astype(str), dtype=str)
+        arrays["building_nodes"] = busdatabase["nearestnode"].to_numpy()
+        return cls(arrays)
+
+    def save(self, path: str):
+        numpy.savez(path, **self.arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        with numpy.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def near(self, place):
+        # Stops within walking range of a building OSM ID ("w123") or graph node, with the walk in minutes
+        if isinstance(place, str) and not place.isdigit():
+            if place not in self.buildings:
+                raise KeyError(place + " is not a building in the index")
+            node = self.buildings[place]
+        else:
+            node = int(place)
+        k = numpy.searchsorted(self.nodes, node)
+        if k == len(self.nodes) or self.nodes[k] != node:
+            raise KeyError(str(place) + " is not a building or node in the index")
+        return self.nearstops[self.indptr[k]:self.indptr[k + 1]], self.nearminutes[self.indptr[k]:self.indptr[k + 1]]
+
+    def query(self, origin, destination, time_of_day: float, day: str = "Weekday"):
+        # Minutes from origin to destination by transit leaving at time_of_day, NaN if no journey is found
+        times, offsets, arrivals = self.tables[day]
+        accessstops, accesswalk = self.near(origin)
+        egressstops, egresswalk = self.near(destination)
+        labels = numpy.minimum(time_of_day + accesswalk, self.stop_key - 1)
+        rows = numpy.searchsorted(times, accessstops * self.stop_key + labels, side="right")
+        rows = rows[rows < offsets[accessstops + 1]]
+        if len(rows) == 0 or len(egressstops) == 0:
+            return numpy.nan
+        best = numpy.min(arrivals[rows][:, egressstops] + egresswalk[None, :])
+        return best - time_of_day if numpy.isfinite(best) else numpy.nan
+
+
+def serve(index: PointIndex, host: str = "127.0.0.1", port: int = 8000):
+    # GET /query?origin=w123&destination=n456&time=510&day=Weekday returns {"minutes": ...}
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            args = urllib.parse.parse_qs(url.query)
+            if url.path != "/query":
+                return self.reply(404, {"error": "not found"})
+            try:
+                minutes = index.query(args["origin"][0], args["destination"][0], float(args["time"][0]),
+                                      args.get("day", ["Weekday"])[0])
+            except (KeyError, ValueError) as error:
+                return self.reply(400, {"error": str(error.args[0]) if error.args else str(error)})
+            self.reply(200, {"minutes": None if numpy.isnan(minutes) else float(minutes)})
+
+        def reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    http.server.ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    serve(PointIndex.load(sys.argv[1]), port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
@@ -0,0 +1,104 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class Profiler:
+    # Timed spans and counters for one tool run. Finished spans are passed to message (arcpy.AddMessage in the
+    # toolbox) and everything can be saved as a Chrome trace (chrome://tracing or ui.perfetto.dev) with the counters
+    # under otherData. A disabled profiler hands out one shared null context and ignores counts, so instrumented
+    # code costs a method call per span.
+    def __init__(self, enabled: bool = True, message=None, progressor=None):
+        self.enabled = enabled
+        self.message = message
+        self.progressor = progressor
+        self.events = []
+        self.counters = {}
+        self._started = time.perf_counter()
+        self._depth = threading.local()
+        self._null = contextlib.nullcontext()
+        self._stage = None
+        self._stagestarted = None
+
+    def span(self, name: str, **fields):
+        if not self.enabled:
+            return self._null
+        return self._span(name, fields)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, fields: dict):
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._depth.value = depth
+            self.add_span(name, started, seconds, depth, **fields)
+
+    def add_span(self, name: str, started: float, seconds: float, depth: int = None, **fields):
+        # Also used for spans timed elsewhere, such as routes timed inside pool workers; depth defaults to the
+        # nesting level of the caller
+        if not self.enabled:
+            return
+        depth = getattr(self._depth, "value", 0) if depth is None else depth
+        self.events.append({"name": name, "ph": "X", "ts": (started - self._started) * 1e6, "dur": seconds * 1e6,
+                            "pid": os.getpid(), "tid": threading.get_ident(), "args": dict(fields, depth=depth)})
+        if self.message is not None:
+            self.message("{}{}: {:.2f}s".format("  " * depth, name, seconds))
+
+    def stage(self, name: str = None):
+        # Ends the current top-level stage and starts the next one, for straight-line code like the toolbox's execute.
+        # The stage name also becomes the progressor label, whether or not profiling is on.
+        if name is not None:
+            self.progress(name)
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._stage is not None:
+            self._depth.value = 0
+            self.add_span(self._stage, self._stagestarted, now - self._stagestarted)
+        self._stage, self._stagestarted = name, now
+        self._depth.value = 0 if name is None else 1
+
+    def count(self, name: str, value: float = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def rate(self, name: str, items: float, seconds: float):
+        # Items per second, recorded as a counter and reported
+        if self.enabled and seconds > 0:
+            self.counters[name] = items / seconds
+            if self.message is not None:
+                self.message("{}: {:,.0f}".format(name, items / seconds))
+
+    def progress(self, label: str, position: int = None, total: int = None):
+        # Step progressor (arcpy.SetProgressor and friends) when total is given, otherwise a label change
+        if self.progressor is not None:
+            self.progressor(label, position, total)
+
+    def trace(self):
+        return {"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": {"counters": self.counters}}
+
+    def save(self, path: str):
+        if not self.enabled:
+            return
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+
+# Profiler that library code reports to; the toolbox replaces it for the length of a run
+active = Profiler(enabled=False)
+
+
+@contextlib.contextmanager
+def profiling(profiler: Profiler):
+    global active
+    previous, active = active, profiler
+    try:
+        yield profiler
+    finally:
+        active = previous
@@ -0,0 +1,415 @@
+import numpy
+import profiling
+from utils import Route
+
+
+class RaptorRoute:
+    # A ride boards at one stop of the route at its next listed time and gets off at any stop at the next listed
+    # time there, the same model CalculateTravelTime uses, so routes that revisit stops need no trip ids. Getting
+    # off where the ride boarded is allowed too, as it is there: on a loop route that is riding the whole loop,
+    # and without it a route could beat the Transit column built from it.
+    def __init__(self, route: Route, stop_index: dict):
+        self.route_name = route.route_name
+        self.stops = numpy.array([stop_index[stop.OSM_ID] for stop in route.stops], dtype=int)
+        self.times = [numpy.unique(numpy.asarray(stop.times, dtype=float)) for stop in route.stops]
+
+    def next_time(self, position: int, after):
+        times = self.times[position]
+        if len(times) == 0:
+            return numpy.full(numpy.shape(after), numpy.inf)
+        index = numpy.searchsorted(times, after, side="right")
+        return numpy.where(index < len(times), times[numpy.minimum(index, len(times) - 1)], numpy.inf)
+
+    def previous_time(self, position: int, before):
+        # Latest listed time strictly before before, the mirror of next_time for searches that run backwards
+        times = self.times[position]
+        if len(times) == 0:
+            return numpy.full(numpy.shape(before), -numpy.inf)
+        index = numpy.searchsorted(times, before, side="left") - 1
+        return numpy.where(index >= 0, times[numpy.maximum(index, 0)], -numpy.inf)
+
+
+def transfer_times(walkmatrix: numpy.ndarray, max_walk: float = 600):
+    # Stop-to-stop walking seconds read off the building-by-stop walk matrix: the shortest walk from stop p to a
+    # building and on to stop q. Pairs further apart than max_walk are left as inf.
+    walkmatrix = numpy.asarray(walkmatrix, dtype=float)
+    transfers = numpy.full((walkmatrix.shape[1], walkmatrix.shape[1]), numpy.inf)
+    for p in range(walkmatrix.shape[1]):
+        near = walkmatrix[walkmatrix[:, p] <= max_walk]
+        if len(near):
+            transfers[p] = numpy.nanmin(near[:, [p]] + near, axis=0)
+    transfers[transfers > max_walk] = numpy.inf
+    numpy.fill_diagonal(transfers, numpy.inf)
+    return transfers
+
+
+class RaptorResult:
+    def __init__(self, raptor, transit, transitround, labelrounds, routeparents, boardparents, walkparents):
+        self.raptor = raptor
+        self.transit = transit
+        self.transitround = transitround
+        self.labelrounds = labelrounds
+        self.routeparents = routeparents
+        self.boardparents = boardparents
+        self.walkparents = walkparents
+
+    def journey(self, query: int, stop: int):
+        # Route names ridden to reach stop with the best arrival that uses at least one bus
+        names = []
+        k = self.transitround[query, stop]
+        while k > 0:
+            if self.walkparents[k][query, stop] >= 0:
+                stop = self.walkparents[k][query, stop]
+            names.append(self.raptor.routes[self.routeparents[k][query, stop]].route_name)
+            stop = self.boardparents[k][query, stop]
+            k = self.labelrounds[k - 1][query, stop]
+        return names[::-1]
+
+
+class ReverseRaptorResult(RaptorResult):
+    # Result of a backward run. transit is the latest bus a query can board at each stop and still make it, and
+    # boardparents holds the stop that ride gets off at, so following the parents goes forward in time.
+    def journey(self, query: int, stop: int):
+        names = []
+        k = self.transitround[query, stop]
+        while k > 0:
+            names.append(self.raptor.routes[self.routeparents[k][query, stop]].route_name)
+            stop = self.boardparents[k][query, stop]
+            j = self.labelrounds[k - 1][query, stop]
+            if j > 0:
+                stop = self.walkparents[j][query, stop]
+            k = j
+        return names
+
+
+class Raptor:
+    # Round-based router over all routes. Round k allows k rides, with walking transfers between stops after each
+    # round. Every query row is routed at once, so many sources cost one set of vectorised scans.
+    def __init__(self, routes: [Route], stop_ids: [str] = None, transfers: numpy.ndarray = None):
+        if stop_ids is None:
+            stop_ids = list(dict.fromkeys(stop.OSM_ID for route in routes for stop in route.stops))
+        self.stop_ids = list(stop_ids)
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.routes = [RaptorRoute(route, self.stop_index) for route in routes]
+        self.transfers = []
+        if transfers is not None:
+            transfers = numpy.asarray(transfers, dtype=float) / 60
+            self.transfers = [(p, numpy.flatnonzero(numpy.isfinite(transfers[p])), transfers[p])
+                              for p in range(len(self.stop_ids)) if numpy.isfinite(transfers[p]).any()]
+        self._last = None
+
+    def run(self, initial, max_transfers: int = 2, reverse: bool = False):
+        # initial holds the time each query reaches each stop without riding (inf if it does not), shape
+        # (queries, stops). Boarding needs a listed time strictly after the label, as in CalculateTravelTime.
+        # labels is the earliest time at a stop by any means and is what the next round boards from; transit is
+        # the earliest time that used at least one ride, which is what buildings are scored against. With reverse
+        # the same rules run backwards from a deadline; see _run_reverse.
+        labels = numpy.atleast_2d(numpy.asarray(initial, dtype=float)).copy()
+        labels[numpy.isnan(labels)] = -numpy.inf if reverse else numpy.inf
+        # The queries depend only on the point of interest and time, not on the buildings, so when buildings are
+        # scored chunk by chunk every chunk after the first reuses the previous run
+        key = (labels.shape, labels.tobytes(), max_transfers, reverse)
+        if self._last is not None and self._last[0] == key:
+            profiling.active.count("raptor_reused_runs")
+            return self._last[1]
+        with profiling.active.span("RAPTOR run", queries=len(labels), stops=labels.shape[1], reverse=reverse):
+            result = self._run_reverse(labels, max_transfers) if reverse else self._run(labels, max_transfers)
+        profiling.active.count("raptor_queries", len(labels))
+        self._last = (key, result)
+        return result
+
+    def _run(self, labels, max_transfers: int):
+        queries = len(labels)
+        labelround = numpy.zeros(labels.shape, dtype=numpy.int8)
+        transit = numpy.full(labels.shape, numpy.inf)
+        transitround = numpy.zeros(labels.shape, dtype=numpy.int8)
+        labelrounds, routeparents, boardparents, walkparents = [labelround.copy()], [None], [None], [None]
+        marked = labels < numpy.inf
+        for k in range(1, max_transfers + 2):
+            previous = labels.copy()
+            previoustransit = transit.copy()
+            arrived = numpy.full(labels.shape, numpy.inf)
+            routeparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            boardparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            walkparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            for r, route in enumerate(self.routes):
+                boarding = numpy.where(marked[:, route.stops], previous[:, route.stops], numpy.inf)
+                if not numpy.isfinite(boarding).any():
+                    continue
+                departures = [route.next_time(a, boarding[:, a]) for a in range(len(route.stops))]
+                for b, stop in enumerate(route.stops):
+                    best = numpy.full(queries, numpy.inf)
+                    board = numpy.full(queries, -1, dtype=numpy.int32)
+                    for a, departure in enumerate(departures):
+                        arrival = route.next_time(b, departure)
+                        better = arrival < best
+                        best[better] = arrival[better]
+                        board[better] = route.stops[a]
+                    improve = best < transit[:, stop]
+                    transit[improve, stop] = best[improve]
+                    arrived[improve, stop] = best[improve]
+                    routeparent[improve, stop] = r
+                    boardparent[improve, stop] = board[improve]
+                    walkparent[improve, stop] = -1
+            for p, targets, minutes in self.transfers:
+                if not numpy.isfinite(arrived[:, p]).any():
+                    continue
+                walked = arrived[:, [p]] + minutes[targets]
+                improve = walked < transit[:, targets]
+                rows, columns = numpy.nonzero(improve)
+                transit[rows, targets[columns]] = walked[rows, columns]
+                walkparent[rows, targets[columns]] = p
+            transitround[transit < previoustransit] = k
+            marked = transit < labels
+            labels[marked] = transit[marked]
+            labelround[marked] = k
+            labelrounds.append(labelround.copy())
+            routeparents.append(routeparent)
+            boardparents.append(boardparent)
+            walkparents.append(walkparent)
+            if not marked.any():
+                break
+        return RaptorResult(self, transit, transitround, labelrounds, routeparents, boardparents, walkparents)
+
+    def _run_reverse(self, labels, max_transfers: int):
+        # labels is the time each query must get off a bus at each stop before (-inf if it cannot) and transit the
+        # latest listed departure it can board at each stop and still make every later connection. A ride from a
+        # to b keeps the forward rules: it boards at a listed time strictly after the walker reaches a and gets
+        # off at the next listed time at b, so the latest boarding is the last time at a before the last time at b
+        # before b's label. Walking transfers run from the stop a ride ends at to the stop the next one boards at.
+        queries = len(labels)
+        labelround = numpy.zeros(labels.shape, dtype=numpy.int8)
+        transit = numpy.full(labels.shape, -numpy.inf)
+        transitround = numpy.zeros(labels.shape, dtype=numpy.int8)
+        labelrounds, routeparents, boardparents, walkparents = [labelround.copy()], [None], [None], [None]
+        # A forward run can take a walking transfer after its last ride before the final walk, so the deadlines
+        # also spread over one transfer
+        deadlines = labels.copy()
+        for p, targets, minutes in self.transfers:
+            labels[:, p] = numpy.maximum(labels[:, p], numpy.max(deadlines[:, targets] - minutes[targets], axis=1))
+        marked = labels > -numpy.inf
+        for k in range(1, max_transfers + 2):
+            previous = labels.copy()
+            previoustransit = transit.copy()
+            boarded = numpy.full(labels.shape, -numpy.inf)
+            routeparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            alightparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            walkparent = numpy.full(labels.shape, -1, dtype=numpy.int32)
+            for r, route in enumerate(self.routes):
+                alighting = numpy.where(marked[:, route.stops], previous[:, route.stops], -numpy.inf)
+                if not (alighting > -numpy.inf).any():
+                    continue
+                arrivals = [route.previous_time(b, alighting[:, b]) for b in range(len(route.stops))]
+                for a, stop in enumerate(route.stops):
+                    best = numpy.full(queries, -numpy.inf)
+                    alight = numpy.full(queries, -1, dtype=numpy.int32)
+                    for b, arrival in enumerate(arrivals):
+                        departure = route.previous_time(a, arrival)
+                        better = departure > best
+                        best[better] = departure[better]
+                        alight[better] = route.stops[b]
+                    improve = best > transit[:, stop]
+                    transit[improve, stop] = best[improve]
+                    boarded[improve, stop] = best[improve]
+                    routeparent[improve, stop] = r
+                    alightparent[improve, stop] = alight[improve]
+            # A ride that boards at q can follow one that got off at q itself before that departure, or at any p
+            # within walking distance early enough to walk over
+            candidates = boarded.copy()
+            walkparent[boarded > -numpy.inf] = numpy.nonzero(boarded > -numpy.inf)[1]
+            for p, targets, minutes in self.transfers:
+                walked = boarded[:, targets] - minutes[targets]
+                if not (walked > -numpy.inf).any():
+                    continue
+                best = numpy.argmax(walked, axis=1)
+                latest = walked[numpy.arange(queries), best]
+                improve = latest > candidates[:, p]
+                candidates[improve, p] = latest[improve]
+                walkparent[improve, p] = targets[best[improve]]
+            transitround[transit > previoustransit] = k
+            marked = candidates > labels
+            labels[marked] = candidates[marked]
+            labelround[marked] = k
+            labelrounds.append(labelround.copy())
+            routeparents.append(routeparent)
+            boardparents.append(alightparent)
+            walkparents.append(walkparent)
+            if not marked.any():
+                break
+        return ReverseRaptorResult(self, transit, transitround, labelrounds, routeparents, boardparents,
+                                   walkparents)
+
+    def departure_events(self, time_of_day: float):
+        # For each stop, the listed departures after time_of_day. A walker reaching the stop between two
+        # consecutive departures catches the later one, so each gap is one query with the earlier time as label.
+        events = []
+        for s in range(len(self.stop_ids)):
+            times = [route.times[j] for route in self.routes for j in numpy.flatnonzero(route.stops == s)]
+            times = numpy.unique(numpy.concatenate(times)) if times else numpy.array([])
+            first = numpy.searchsorted(times, time_of_day, side="right")
+            events.append((times, first))
+        return events
+
+    def arrivals(self, buildingwalk, destinationwalk, departures, max_transfers: int = 2):
+        # Arrival minute at every building for each departure time from the point of interest, shape (buildings,
+        # departures), with the query row and stop that achieved it. Departure times that catch the same buses
+        # everywhere share one query.
+        buildingwalk = numpy.atleast_2d(numpy.asarray(buildingwalk, dtype=float)) / 60
+        destinationwalk = numpy.asarray(destinationwalk, dtype=float).reshape(-1) / 60
+        departures = numpy.atleast_1d(numpy.asarray(departures, dtype=float))
+        buildingwalk, buildingrows = numpy.unique(buildingwalk, axis=0, return_inverse=True)
+        buildingrows = buildingrows.reshape(-1)
+        events = self.departure_events(departures.min())
+        arrival = numpy.full((len(buildingwalk), len(departures)), numpy.inf)
+        query = numpy.zeros(arrival.shape, dtype=int)
+        stop = numpy.zeros(arrival.shape, dtype=int)
+        signatures = numpy.stack([numpy.searchsorted(times, departures + destinationwalk[s], side="right")
+                                  for s, (times, first) in enumerate(events)], axis=1)
+        signatures, representative, inverse = numpy.unique(signatures, axis=0, return_index=True,
+                                                           return_inverse=True)
+        result = self.run(departures[representative][:, None] + destinationwalk[None, :], max_transfers)
+        for t, q in enumerate(inverse.reshape(-1)):
+            arrivals = result.transit[q][None, :] + buildingwalk
+            arrivals[numpy.isnan(arrivals)] = numpy.inf
+            stop[:, t] = numpy.argmin(arrivals, axis=1)
+            arrival[:, t] = arrivals[numpy.arange(len(arrivals)), stop[:, t]]
+            query[:, t] = q
+        return arrival[buildingrows], query[buildingrows], stop[buildingrows], result
+
+    def latest_departures(self, buildingwalk, destinationwalks, deadlines, max_transfers: int = 2):
+        # Latest minute every building can leave and still reach the point of interest by the deadline, shape
+        # (buildings, queries), with the stop it boards at. Each query is one deadline and one row of
+        # destinationwalks (the point of interest's walk seconds over stop_ids), broadcast against each other,
+        # and all of them are one backward run whatever the number of buildings. Leaving at the returned minute
+        # itself reaches the first stop just as the bus leaves, so -inf means no bus makes it.
+        buildingwalk = numpy.atleast_2d(numpy.asarray(buildingwalk, dtype=float)) / 60
+        destinationwalks = numpy.asarray(destinationwalks, dtype=float).reshape(-1, len(self.stop_ids)) / 60
+        deadlines = numpy.atleast_1d(numpy.asarray(deadlines, dtype=float))
+        buildingwalk, buildingrows = numpy.unique(buildingwalk, axis=0, return_inverse=True)
+        buildingrows = buildingrows.reshape(-1)
+        buildingwalk[numpy.isnan(buildingwalk)] = numpy.inf
+        # Getting off at the deadline minus the last walk still arrives in time, so the exclusive label is the
+        # next float up
+        result = self.run(numpy.nextafter(deadlines[:, None] - destinationwalks, numpy.inf), max_transfers,
+                          reverse=True)
+        departures = numpy.full((len(buildingwalk), len(result.transit)), -numpy.inf)
+        stop = numpy.zeros(departures.shape, dtype=int)
+        for q, boarding in enumerate(result.transit):
+            leaving = boarding[None, :] - buildingwalk
+            stop[:, q] = numpy.argmax(leaving, axis=1)
+            departures[:, q] = leaving[numpy.arange(len(leaving)), stop[:, q]]
+        return departures[buildingrows], stop[buildingrows], result
+
+    def journey_codes(self, result: RaptorResult, query, stop, reachable):
+        # Integer code of the route chain for each entry (-1 if unreachable) with the chain of each code and its
+        # transfer count. Each (query, stop) pair is reconstructed once.
+        keys, inverse = numpy.unique(numpy.asarray(query)[reachable] * len(self.stop_ids)
+                                     + numpy.asarray(stop)[reachable], return_inverse=True)
+        chains = {}
+        keycodes = [chains.setdefault(" > ".join(result.journey(*divmod(int(key), len(self.stop_ids)))), len(chains))
+                    for key in keys]
+        codes = numpy.full(numpy.shape(query), -1)
+        codes[reachable] = numpy.array(keycodes, dtype=int)[inverse.reshape(-1)]
+        labels = numpy.empty(len(chains), dtype=object)
+        labels[:] = list(chains)
+        return codes, labels, numpy.array([label.count(" > ") for label in chains], dtype=int)
+
+    def journeys(self, result: RaptorResult, query, stop, reachable):
+        # Route chain and transfer count for each reachable entry
+        codes, labels, transfers = self.journey_codes(result, query, stop, reachable)
+        routes = numpy.full(codes.shape, None, dtype=object)
+        routes[reachable] = labels[codes[reachable]]
+        return routes, numpy.where(reachable, numpy.append(transfers, -1)[codes], -1)
+
+    def travel_times(self, buildingwalk, destinationwalk, time_of_day: float, origin: bool = True,
+                     max_transfers: int = 2):
+        # Minutes between the point of interest and every building using any combination of routes, with the
+        # routes ridden and the number of transfers. buildingwalk and destinationwalk are walking seconds over
+        # stop_ids; with origin=True the trip starts at the point of interest at time_of_day. Otherwise it has to
+        # arrive there by time_of_day, Transit counts back from then to the latest departure that makes it (the
+        # mirror of Origin counting the wait for the first bus), and Transit Departure is that departure.
+        if not origin:
+            departure, stop, result = self.latest_departures(buildingwalk, destinationwalk, time_of_day,
+                                                             max_transfers)
+            reachable = numpy.isfinite(departure[:, 0])
+            routes, transfers = self.journeys(result, numpy.zeros(len(stop), dtype=int), stop[:, 0], reachable)
+            return {"Transit": numpy.where(reachable, time_of_day - departure[:, 0], numpy.nan),
+                    "Transit Routes": routes, "Transit Transfers": transfers,
+                    "Transit Departure": numpy.where(reachable, departure[:, 0], numpy.nan)}
+        arrival, query, stop, result = self.arrivals(buildingwalk, destinationwalk, [time_of_day], max_transfers)
+        reachable = numpy.isfinite(arrival[:, 0])
+        routes, transfers = self.journeys(result, query[:, 0], stop[:, 0], reachable)
+        return {"Transit": numpy.where(reachable, arrival[:, 0] - time_of_day, numpy.nan), "Transit Routes": routes,
+                "Transit Transfers": transfers}
+
+    def batch_travel_times(self, buildingwalk, destinationwalks, time_of_day: float, origin: bool = True,
+                           max_transfers: int = 2):
+        # Transit minutes between every building and each of several points of interest, shape (buildings, points).
+        # destinationwalks has one row of walking seconds over stop_ids per point. All points share one run with a
+        # query per point, forward from time_of_day as origins or backward from it as the arrival deadline.
+        if not origin:
+            departures, stop, result = self.latest_departures(buildingwalk, destinationwalks, time_of_day,
+                                                              max_transfers)
+            traveltimes = time_of_day - departures
+            traveltimes[~numpy.isfinite(traveltimes)] = numpy.nan
+            return traveltimes
+        buildingwalk = numpy.atleast_2d(numpy.asarray(buildingwalk, dtype=float)) / 60
+        destinationwalks = numpy.asarray(destinationwalks, dtype=float).reshape(-1, len(self.stop_ids)) / 60
+        buildingwalk, buildingrows = numpy.unique(buildingwalk, axis=0, return_inverse=True)
+        destinationwalks, destinationrows = numpy.unique(destinationwalks, axis=0, return_inverse=True)
+        buildingwalk[numpy.isnan(buildingwalk)] = numpy.inf
+        result = self.run(time_of_day + destinationwalks, max_transfers)
+        transit = numpy.where(numpy.isnan(result.transit), numpy.inf, result.transit)
+        arrival = numpy.full((len(buildingwalk), len(destinationwalks)), numpy.inf)
+        for d in range(len(destinationwalks)):
+            arrival[:, d] = numpy.min(transit[d][None, :] + buildingwalk, axis=1)
+        traveltimes = arrival[buildingrows.reshape(-1)][:, destinationrows.reshape(-1)] - time_of_day
+        traveltimes[~numpy.isfinite(traveltimes)] = numpy.nan
+        return traveltimes
+
+    def profile(self, buildingwalk, destinationwalk, start: float, end: float, interval: float = 15,
+                origin: bool = True, max_transfers: int = 2, walking=None):
+        # Travel time for every building at each departure from start to end in steps of interval minutes, plus
+        # median, 90th percentile and the most common fastest mode of each hour. walking is the Walking column in
+        # minutes; when given, a departure is walked whenever that is faster than any transit journey. With
+        # origin=False each time is an arrival deadline at the point of interest instead.
+        departures = numpy.arange(start, end + interval / 2, interval, dtype=float)
+        if origin:
+            arrival, query, stop, result = self.arrivals(buildingwalk, destinationwalk, departures, max_transfers)
+            traveltimes = arrival - departures[None, :]
+        else:
+            latest, stop, result = self.latest_departures(buildingwalk, destinationwalk, departures, max_transfers)
+            query = numpy.broadcast_to(numpy.arange(len(departures)), stop.shape)
+            traveltimes = departures[None, :] - latest
+        codes, labels, transfers = self.journey_codes(result, query, stop, numpy.isfinite(traveltimes))
+        labels = numpy.append(labels, "Walking")
+        if walking is not None:
+            walking = numpy.asarray(walking, dtype=float).reshape(-1, 1)
+            walks = walking < numpy.where(numpy.isfinite(traveltimes), traveltimes, numpy.inf)
+            traveltimes = numpy.where(walks, walking, traveltimes)
+            codes[walks] = len(labels) - 1
+        traveltimes[~numpy.isfinite(traveltimes)] = numpy.nan
+        modes = numpy.full(codes.shape, None, dtype=object)
+        modes[codes >= 0] = labels[codes[codes >= 0]]
+        summary = {"Median": _nanquantile(traveltimes, 0.5), "P90": _nanquantile(traveltimes, 0.9),
+                   "Fastest": _nanquantile(traveltimes, 0)}
+        rows = numpy.repeat(numpy.arange(len(codes))[:, None], codes.shape[1], axis=1)
+        for hour in numpy.unique(departures // 60).astype(int):
+            inhour = (departures // 60 == hour)[None, :] & (codes >= 0)
+            counts = numpy.zeros((len(codes), len(labels)), dtype=numpy.int32)
+            numpy.add.at(counts, (rows[inhour], codes[inhour]), 1)
+            summary["Fastest Mode {:02d}:00".format(hour)] = numpy.where(counts.max(axis=1) > 0,
+                                                                         labels[counts.argmax(axis=1)], None)
+        return departures, traveltimes, modes, summary
+
+
+def _nanquantile(values, q: float):
+    # Row-wise quantile with linear interpolation that skips NaN, without numpy.nanpercentile's per-row loop
+    ordered = numpy.sort(values, axis=1)
+    count = numpy.sum(~numpy.isnan(values), axis=1)
+    position = q * numpy.maximum(count - 1, 0)
+    lower = numpy.floor(position).astype(int)
+    upper = numpy.minimum(lower + 1, numpy.maximum(count - 1, 0))
+    rows = numpy.arange(len(values))
+    low, high = ordered[rows, lower], ordered[rows, upper]
+    return numpy.where(count > 0, low + (high - low) * (position - lower), numpy.nan)
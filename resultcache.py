@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import numpy
+import pandas
+import pyarrow
+import pyarrow.ipc
+import profiling
+
+
+def content_hash(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = numpy.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str):
+    # Identifies an input file by its size and modification time, for files too large to hash on every run
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class ResultCache:
+    # Per-building result columns on disk, one uncompressed feather file per query, so hits are memory mapped and
+    # read a chunk of buildings at a time. Reads refresh the file's modification time, so evicting the oldest files
+    # first when the folder goes over max_bytes is least-recently-used order.
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        if max_bytes > 0:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(**parts):
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str):
+        path = os.path.join(self.path, key + ".feather")
+        if self.max_bytes <= 0 or not os.path.isfile(path):
+            profiling.active.count("cache_misses")
+            return None
+        profiling.active.count("cache_hits")
+        os.utime(path)
+        return CacheEntry(path)
+
+    def put(self, key: str, columns: pandas.DataFrame):
+        # Stores columns given for every building in row order
+        with self.writer(key) as writer:
+            writer.write(numpy.arange(len(columns)), columns)
+
+    def writer(self, key: str):
+        # For storing an entry a chunk of buildings at a time as the chunks are computed; the entry only appears,
+        # and older entries are only evicted, when the writer closes without an error
+        return CacheWriter(self, os.path.join(self.path, key + ".feather"))
+
+    def evict(self, path: str):
+        # Drops the least recently used entries until the folder fits in max_bytes, never path itself
+        entries = sorted((entry for entry in os.scandir(self.path) if entry.name.endswith(".feather")),
+                         key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes or entry.path == path:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+
+class CacheWriter:
+    # Appends (rows, columns) batches to one cache entry, rows being the buildings' positions in the feature
+    # table. Text columns are always stored as strings so a batch where every value is missing keeps the schema.
+    def __init__(self, cache: ResultCache, path: str):
+        self.cache = cache
+        self.path = path
+        self._writer = None
+        self._schema = None
+        self._file = None
+
+    def write(self, rows, columns: pandas.DataFrame):
+        if self.cache.max_bytes <= 0:
+            return
+        columns = pandas.DataFrame(columns).reset_index(drop=True)
+        if self._writer is None:
+            fields = [pyarrow.field("row", pyarrow.int64())]
+            fields += [pyarrow.field(name, pyarrow.string() if pandas.api.types.is_string_dtype(dtype)
+                                     else pyarrow.from_numpy_dtype(dtype)) for name, dtype in columns.dtypes.items()]
+            self._schema = pyarrow.schema(fields)
+            self._file = pyarrow.OSFile(self.path + ".tmp", "wb")
+            self._writer = pyarrow.ipc.new_file(self._file, self._schema)
+        arrays = [pyarrow.array(numpy.asarray(rows, dtype=numpy.int64))]
+        arrays += [pyarrow.array(columns[field.name].to_numpy(), type=field.type, from_pandas=True)
+                   for field in self._schema if field.name != "row"]
+        self._writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    def close(self, keep: bool = True):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._file.close()
+        if keep:
+            os.replace(self.path + ".tmp", self.path)
+            self.cache.evict(self.path)
+        else:
+            os.remove(self.path + ".tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(keep=exc_type is None)
+
+
+class CacheEntry:
+    # One cached entry, memory mapped; rows(...) reads just the given buildings
+    def __init__(self, path: str):
+        self.table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+        self.columns = [name for name in self.table.column_names if name != "row"]
+        stored = self.table.column("row").to_numpy()
+        self.position = numpy.empty(len(stored), dtype=numpy.int64)
+        self.position[stored] = numpy.arange(len(stored))
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def rows(self, rows=None, columns: [str] = None):
+        # DataFrame of the given buildings in the order asked for, by default all of them in row order
+        position = self.position if rows is None else self.position[numpy.asarray(rows)]
+        return self.table.select(columns or self.columns).take(pyarrow.array(position)).to_pandas()
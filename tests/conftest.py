@@ -0,0 +1,29 @@
+import os
+import pandas
+import pytest
+from benchmark import build_fixture
+from pipeline import Options
+
+
+@pytest.fixture(scope="session")
+def region(tmp_path_factory):
+    # A small benchmark fixture laid out like a precomputed toolbox run, built once per test session
+    path = str(tmp_path_factory.mktemp("region"))
+    build_fixture(path, 200)
+    return path
+
+
+@pytest.fixture
+def region_options(region, tmp_path):
+    # Options for a run on the region fixture, writing into this test's folder, with any attribute changed
+    buildings = pandas.read_feather(os.path.join(region, "buildings.feather"), columns=["element", "id"])
+
+    def options(**changes):
+        values = dict(features=os.path.join(region, "buildings.feather"),
+                      bus_database=os.path.join(region, "BusDatabase.feather"),
+                      graphml=os.path.join(region, "graph.graphml"), stops=os.path.join(region, "stops.json"),
+                      poi=buildings["element"][0][0] + str(buildings["id"][0]), time_of_day=510, processes=1,
+                      output_folder=str(tmp_path / "output"), cache_folder=str(tmp_path / "cache"))
+        values.update(changes)
+        return Options(**values)
+    return options
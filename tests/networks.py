@@ -0,0 +1,32 @@
+import networkx
+import numpy
+from utils import Route, Stop
+
+# Small networks shared by several test modules
+
+
+def toy_network(seed):
+    # Six stops, three routes that revisit stops (the first is a loop), and walks from twenty buildings. Buses run
+    # until late so every walk reaches a stop before its last bus, which CalculateTravelTime does not handle.
+    rng = numpy.random.default_rng(seed)
+    stop_ids = ["n{}".format(i) for i in range(6)]
+    routes = []
+    for r, sequence in enumerate([[0, 1, 2, 0], [2, 3, 4, 3], [5, 1, 4]]):
+        starts = numpy.sort(rng.uniform(420, 1380, 12)).round()
+        stops = [Stop(stop_ids[s], (starts + 7 * position).tolist()) for position, s in enumerate(sequence)]
+        routes.append(Route("Weekday", "R{}".format(r), "Merced Bus", stops))
+    walk = rng.uniform(60, 1500, (20, 6)).round()
+    walk[rng.random(walk.shape) < 0.3] = numpy.inf
+    return routes, stop_ids, walk
+
+
+def random_graph(seed, nodes=40):
+    rng = numpy.random.default_rng(seed)
+    graph = networkx.MultiDiGraph()
+    for node in range(nodes):
+        graph.add_node(1000 + node * 7, x=-120.5 + rng.random() / 100, y=37.3 + rng.random() / 100)
+    ids = list(graph.nodes)
+    for _ in range(nodes * 3):
+        a, b = rng.choice(ids, 2, replace=False).tolist()
+        graph.add_edge(a, b, length=float(rng.uniform(10, 300)))
+    return graph
@@ -0,0 +1,56 @@
+import geopandas
+import numpy
+import pandas
+import pytest
+import shapely
+from aggregate import cell_polygons, grid_cells, summarise_cells, write_grids
+
+
+@pytest.mark.parametrize("grid", ["Hexagon", "Square"])
+def test_every_point_lies_in_its_cell(grid):
+    rng = numpy.random.default_rng(0)
+    x, y = rng.uniform(-2000, 2000, 500), rng.uniform(-2000, 2000, 500)
+    polygons = cell_polygons(grid_cells(x, y, grid, 250), grid, 250)
+    assert shapely.contains_xy(shapely.buffer(polygons, 1e-6), x, y).all()
+
+
+def test_summary_matches_a_groupby():
+    rng = numpy.random.default_rng(1)
+    cells = rng.integers(-3, 3, (400, 2))
+    times = rng.uniform(0, 60, 400)
+    times[rng.random(400) < 0.2] = numpy.nan
+    modes = rng.choice(numpy.array(["Walking", "M1", "M2"], dtype=object), 400)
+    keys, summary = summarise_cells(cells, times, modes)
+    table = pandas.DataFrame({"Column": cells[:, 0], "Row": cells[:, 1], "time": times, "mode": modes})
+    reachable = table.dropna(subset=["time"]).groupby(["Column", "Row"])
+    expected = pandas.DataFrame({"Buildings": table.groupby(["Column", "Row"]).size(),
+                                 "Median Travel Time": reachable["time"].median(),
+                                 "Min Travel Time": reachable["time"].min()})
+    found = summary.set_index(["Column", "Row"])
+    pandas.testing.assert_frame_equal(found[expected.columns], expected, check_names=False, check_dtype=False)
+    counts = table.dropna(subset=["time"]).groupby(["Column", "Row", "mode"]).size().unstack(fill_value=0)
+    dominant = found.loc[counts.index, "Dominant Mode"]
+    assert (counts.to_numpy()[numpy.arange(len(counts)), counts.columns.get_indexer(dominant)] == counts.max(axis=1)).all()
+
+
+def test_unreachable_cells_have_no_times():
+    keys, summary = summarise_cells(numpy.array([[0, 0], [1, 0]]), numpy.array([5.0, numpy.inf]),
+                                    numpy.array(["M1", None], dtype=object))
+    assert summary["Reachable Buildings"].tolist() == [1, 0]
+    assert numpy.isnan(summary["Median Travel Time"].iloc[1]) and pandas.isna(summary["Dominant Mode"].iloc[1])
+
+
+def test_grid_layers_and_raster_are_written(tmp_path):
+    rng = numpy.random.default_rng(2)
+    points = geopandas.GeoSeries(shapely.points(rng.uniform(-120.52, -120.46, 300), rng.uniform(37.28, 37.33, 300)), crs=4326)
+    features = geopandas.GeoDataFrame({"id": numpy.arange(300)}, geometry=points)
+    times = rng.uniform(5, 60, 300)
+    modes = rng.choice(numpy.array(["Walking", "M1"], dtype=object), 300)
+    paths = write_grids(str(tmp_path / "fastest"), features, times, modes, "Hexagon", (250, 1000))
+    assert [path.rsplit("_", 1)[1] for path in paths] == ["hexagon250.parquet", "hexagon1000.parquet"]
+    for path in paths:
+        assert geopandas.read_parquet(path)["Buildings"].sum() == 300
+    rasterio = pytest.importorskip("rasterio")
+    paths = write_grids(str(tmp_path / "fastest"), features, times, modes, "Square", (500,), raster=True)
+    with rasterio.open(paths[-1]) as dataset:
+        assert dataset.count == 4 and numpy.nansum(dataset.read(3)) == 300
@@ -0,0 +1,41 @@
+import numpy
+import pytest
+from raptor import Raptor, transfer_times
+from tests.networks import toy_network
+from utils import CalculateArriveByTimes
+
+
+def arrival(raptor, walk, building, leave):
+    # Arrival at the point of interest (walk row 0) leaving the building at leave, inf if no bus gets there
+    minutes = raptor.travel_times(walk[[0]], walk[building], leave)["Transit"][0]
+    return leave + minutes if numpy.isfinite(minutes) else numpy.inf
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_latest_departure_is_the_mirror_of_depart_at(seed):
+    routes, stop_ids, walk = toy_network(seed)
+    raptor = Raptor(routes, stop_ids, transfer_times(walk))
+    for deadline in (480, 600, 900):
+        departures = raptor.travel_times(walk, walk[0], deadline, origin=False)["Transit Departure"]
+        for building, departure in enumerate(departures):
+            if numpy.isnan(departure):
+                # Not even leaving at the start of the day makes it
+                assert arrival(raptor, walk, building, 0) > deadline
+                continue
+            # Leaving at the departure itself reaches the first stop just as the bus leaves
+            assert arrival(raptor, walk, building, departure - 1e-6) <= deadline + 1e-6
+            assert arrival(raptor, walk, building, departure + 1e-6) > deadline
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_reverse_run_on_one_route_matches_the_arrive_by_kernel(seed):
+    routes, stop_ids, walk = toy_network(seed)
+    for route in routes:
+        columns = [stop_ids.index(stop.OSM_ID) for stop in route.stops]
+        raptor = Raptor([route], stop_ids)
+        for deadline in (480, 600, 900):
+            transit = raptor.travel_times(walk, walk[0], deadline, origin=False, max_transfers=0)["Transit"]
+            with numpy.errstate(invalid="ignore"):
+                expected = CalculateArriveByTimes(walk[:, columns], walk[0, columns], route, deadline)
+            expected[~(expected < 10000000000.0)] = numpy.nan
+            numpy.testing.assert_allclose(transit, expected)
@@ -0,0 +1,28 @@
+import numpy
+import pandas
+import pytest
+from batch import batch_table
+from raptor import Raptor, transfer_times
+from tests.networks import toy_network
+
+
+@pytest.mark.parametrize("origin", [True, False])
+def test_one_run_matches_a_query_per_destination(origin):
+    routes, stop_ids, walk = toy_network(2)
+    raptor = Raptor(routes, stop_ids, transfer_times(walk))
+    points = [0, 3, 7, 3]
+    found = raptor.batch_travel_times(walk, walk[points], 540, origin=origin)
+    for column, point in enumerate(points):
+        numpy.testing.assert_allclose(found[:, column], raptor.travel_times(walk, walk[point], 540, origin=origin)["Transit"])
+
+
+def test_nearest_destination_takes_the_fastest_mode():
+    times = {"Walking": numpy.array([[10.0, 30.0], [numpy.nan, numpy.nan], [50.0, numpy.nan]]),
+             "Transit": numpy.array([[20.0, 5.0], [numpy.nan, numpy.nan], [numpy.nan, 40.0]])}
+    table = batch_table(times, ["A", "B"], pandas.RangeIndex(3), nearest=True)
+    assert table["nearest_destination"].tolist()[::2] == ["B", "B"]
+    assert table["nearest_mode"].tolist()[::2] == ["Transit", "Transit"]
+    assert table["nearest_time"].tolist()[::2] == [5.0, 40.0]
+    assert table.iloc[1].isna().all()
+    wide = batch_table(times, ["A", "B"], pandas.RangeIndex(3))
+    numpy.testing.assert_array_equal(wide.to_numpy(), [[10, 5], [numpy.nan, numpy.nan], [50, 40]])
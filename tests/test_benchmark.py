@@ -0,0 +1,19 @@
+import pytest
+import benchmark
+from benchmark import CASES, build_fixture, compare, run_case
+
+
+def test_only_cases_slower_than_the_tolerance_are_regressions():
+    baseline = {"route-batched 1000 x1": {"seconds": 1.0}, "walk 1000 x1": {"seconds": 2.0}}
+    results = {"route-batched 1000 x1": {"seconds": 1.3}, "walk 1000 x1": {"seconds": 2.3}, "output 1000 x1": {"seconds": 9.0}}
+    assert compare(results, baseline, 0.2) == {"route-batched 1000 x1": (1.0, 1.3)}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_every_case_runs_on_a_small_fixture(tmp_path_factory, monkeypatch, case):
+    path = str(tmp_path_factory.getbasetemp() / "benchmark200")
+    build_fixture(path, 200)
+    # The legacy kernel takes about half a second per building
+    monkeypatch.setattr(benchmark, "LEGACY_SAMPLE", 2)
+    result = run_case(case, path, 1)
+    assert result["items"] > 0 and result["seconds"] > 0
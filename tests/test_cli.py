@@ -0,0 +1,52 @@
+import json
+import os
+import cli
+from output import read_columns
+
+
+def test_command_line_arguments_become_pipeline_options(monkeypatch, capsys):
+    runs = []
+    monkeypatch.setattr(cli, "run", lambda options: runs.append(options) or ["out.parquet"])
+    arguments = ["walking-score", "--features", "features.feather", "--bbox", "-120.6", "37.2", "-120.4", "37.4",
+                 "--days", "Weekday", "Weekend", "--window", "400", "500", "10", "--weights", "amenity=2", " shop = 0.5",
+                 "--processes", "3"]
+    assert cli.main(arguments) == 0
+    options = runs[0]
+    assert options.mode == "Walking Score" and options.region_mode == "Use Bounding Box"
+    assert list(options.bbox) == [-120.6, 37.2, -120.4, 37.4] and options.days == ["Weekday", "Weekend"]
+    assert (options.window_start, options.window_end, options.window_interval) == (400, 500, 10)
+    assert options.score_weights == {"amenity": 2.0, "shop": 0.5} and options.processes == 3
+    assert capsys.readouterr().out == "Wrote out.parquet\n"
+
+
+def region_arguments(region, poi):
+    return ["--features", os.path.join(region, "buildings.feather"),
+            "--bus-database", os.path.join(region, "BusDatabase.feather"),
+            "--graphml", os.path.join(region, "graph.graphml"), "--stops", os.path.join(region, "stops.json"),
+            "--poi", poi, "--time", "510", "--processes", "1"]
+
+
+def test_travel_time_command_writes_its_output(region, region_options, tmp_path, capsys):
+    poi = region_options().poi
+    arguments = ["travel-time"] + region_arguments(region, poi) + ["--output-folder", str(tmp_path), "--cache-mb", "0"]
+    assert cli.main(arguments) == 0
+    path = str(tmp_path / "traveltime830.parquet")
+    assert "Wrote " + path in capsys.readouterr().out
+    table = read_columns(path, ["Walking", "Transit"])
+    assert len(table) == 200 and table["Walking"].notna().all()
+
+
+def test_a_failing_scenario_does_not_stop_the_others(region_options, tmp_path, capfd):
+    good = {key: value for key, value in vars(region_options()).items()
+            if key in ("features", "bus_database", "graphml", "stops", "poi", "time_of_day")}
+    scenarios = [dict(good, name="fastest", cache_mb=0), dict(good, name="missing", features=str(tmp_path / "missing.feather")),
+                 dict(good, name="walking", mode="Walking Score")]
+    with open(tmp_path / "scenarios.json", "w") as f:
+        json.dump(scenarios, f)
+    output = str(tmp_path / "scenarios")
+    assert cli.main(["scenarios", str(tmp_path / "scenarios.json"), "--jobs", "2", "--output-folder", output]) == 1
+    out, err = capfd.readouterr()
+    assert "[missing] Failed: " in err
+    assert "[fastest] Wrote " in out and "[walking] Wrote " in out
+    assert os.listdir(os.path.join(output, "fastest")) == ["fastestmode830.parquet"]
+    assert os.listdir(os.path.join(output, "walking")) == ["walkingscore.parquet"]
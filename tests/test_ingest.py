@@ -0,0 +1,71 @@
+import gzip
+import networkx
+import numpy
+import shapely
+from ingest import ingest_osm
+from walkgraph import WalkGraph
+
+EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="37.300" lon="-120.500"/>
+  <node id="2" lat="37.300" lon="-120.490"/>
+  <node id="3" lat="37.310" lon="-120.490"/>
+  <node id="4" lat="37.310" lon="-120.500"/>
+  <node id="5" lat="37.305" lon="-120.495"><tag k="addr:housenumber" v="12"/></node>
+  <node id="6" lat="37.320" lon="-120.470"><tag k="addr:street" v="Main Street"/></node>
+  <node id="7" lat="37.330" lon="-120.480"/>
+  <node id="8" lat="37.335" lon="-120.475"/>
+  <node id="9" lat="37.340" lon="-120.460"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="1"/><tag k="building" v="yes"/></way>
+  <way id="11"><nd ref="7"/><nd ref="8"/><tag k="leisure" v="track"/></way>
+  <way id="12"><nd ref="9"/><nd ref="99"/><tag k="building" v="yes"/></way>
+  <way id="13"><nd ref="7"/><nd ref="9"/></way>
+  <relation id="14"><member type="way" ref="10" role="outer"/><tag k="building" v="yes"/></relation>
+</osm>
+"""
+
+
+def graph():
+    nodes = networkx.MultiDiGraph()
+    for node, (x, y) in enumerate([(-120.5, 37.3), (-120.49, 37.312), (-120.47, 37.32), (-120.48, 37.33)]):
+        nodes.add_node(node + 1, x=x, y=y)
+    nodes.add_edge(1, 2, length=10)
+    return WalkGraph.from_networkx(nodes)
+
+
+def test_extract_is_cleaned_like_the_download(tmp_path):
+    path = tmp_path / "region.osm"
+    path.write_text(EXTRACT)
+    features = ingest_osm([str(path)], graph(), processes=1, tiles=1)
+    # The address inside the building, the untagged way, the way missing nodes and the relation are dropped, and
+    # ways come before points
+    assert list(zip(features["element"], features["id"])) == [("way", 10), ("way", 11), ("node", 6)]
+    assert features.geometry.iloc[0].equals_exact(shapely.Point(-120.495, 37.305), 1e-9)
+    assert features["nearestnode"].tolist() == [1, 4, 3]
+    assert features["addr:street"].iloc[2] == "Main Street"
+
+
+def test_tiles_processes_and_overlapping_extracts_give_the_same_table(tmp_path):
+    (tmp_path / "region.osm").write_text(EXTRACT)
+    with gzip.open(tmp_path / "copy.osm.gz", "wt") as f:
+        f.write(EXTRACT)
+    expected = ingest_osm([str(tmp_path / "region.osm")], graph(), processes=1, tiles=1)
+    found = ingest_osm([str(tmp_path / "region.osm"), str(tmp_path / "copy.osm.gz")], graph(), processes=2, tiles=3)
+    assert found.drop(columns="geometry").equals(expected.drop(columns="geometry"))
+    assert found.geometry.geom_equals(expected.geometry).all()
+
+
+def test_bbox_keeps_features_whose_centroid_is_inside(tmp_path):
+    path = tmp_path / "region.osm"
+    path.write_text(EXTRACT)
+    features = ingest_osm([str(path)], graph(), bbox=(-120.51, 37.29, -120.48, 37.32), processes=1)
+    assert features["id"].tolist() == [10]
+
+
+def test_nearest_nodes_match_a_brute_force_search():
+    walk = graph()
+    rng = numpy.random.default_rng(0)
+    x, y = rng.uniform(-120.51, -120.46, 50), rng.uniform(37.29, 37.34, 50)
+    walk.nearest_nodes(x[:1], y[:1])
+    scaled = numpy.hypot((x[:, None] - walk.x[None, :]) * walk._scale, y[:, None] - walk.y[None, :])
+    assert walk.nearest_nodes(x, y).tolist() == walk.node_ids[numpy.argmin(scaled, axis=1)].tolist()
@@ -0,0 +1,19 @@
+import numpy
+import pandas
+from utils import CalculateTravelTime, CalculateTravelTimes, RouteTimes, Route, Stop
+
+
+def test_batched_kernel_matches_calculate_travel_time():
+    rng = numpy.random.default_rng(0)
+    stop_ids = ["n1", "n2", "n3", "n1"]
+    # The last stop revisits the first and one list is out of order, which CalculateTravelTime reads as it is
+    times = [[480, 510, 540], [490, 520, 550], [505, 500, 560], [515, 545, 575]]
+    route = Route("Weekday", "Loop", "Merced Bus", [Stop(stop_id, stop_times) for stop_id, stop_times in zip(stop_ids, times)])
+    keys = [("w", i) for i in range(12)]
+    busdatabase = pandas.DataFrame(rng.uniform(60, 1800, (12, 3)).round(), columns=["n1", "n2", "n3"],
+                                   index=pandas.MultiIndex.from_tuples(keys))
+    walk = busdatabase[stop_ids].to_numpy()
+    for time_of_day in (470, 495, 530):
+        expected = [CalculateTravelTime(busdatabase, route, time_of_day, "w0", "w{}".format(i)) for i in range(12)]
+        numpy.testing.assert_allclose(CalculateTravelTimes(walk[0], walk, route, time_of_day), expected)
+        numpy.testing.assert_allclose(CalculateTravelTimes(walk[0], walk, RouteTimes(route), time_of_day), expected)
@@ -0,0 +1,99 @@
+import json
+import os
+import networkx
+import pytest
+from cli import write_stop_file
+from locations import LocationIndex
+from pipeline import HERE
+from timetable import Timetable
+from walkgraph import WalkGraph
+
+
+def line_graph(xs):
+    graph = networkx.MultiDiGraph()
+    for i, x in enumerate(xs):
+        graph.add_node(i + 1, x=x, y=37.3)
+    for i in range(1, len(xs)):
+        graph.add_edge(i, i + 1, length=100)
+        graph.add_edge(i + 1, i, length=100)
+    return WalkGraph.from_networkx(graph)
+
+
+def write_stops(path, coordinates):
+    with open(path, "w") as f:
+        json.dump(coordinates, f)
+
+
+class Api:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.requests = 0
+
+    def NodesGet(self, ids):
+        self.requests += 1
+        return {i: {"lon": self.nodes[i][0], "lat": self.nodes[i][1]} for i in ids if i in self.nodes}
+
+
+def test_stop_snaps_are_reused_for_the_same_graph(tmp_path):
+    graph = line_graph([-120.50, -120.49, -120.48])
+    graph.save(str(tmp_path / "g.walkgraph"))
+    write_stops(tmp_path / "stops.json", {"n10": [-120.481, 37.3]})
+    assert LocationIndex(str(tmp_path / "stops.json"), graph).node("n10") == 3
+    assert LocationIndex(str(tmp_path / "stops.json"), graph).snaps == {"n10": 3}
+
+
+def test_stop_snaps_are_dropped_when_the_graph_is_rebuilt(tmp_path):
+    path = str(tmp_path / "g.walkgraph")
+    graph = line_graph([-120.50, -120.49, -120.48])
+    graph.save(path)
+    write_stops(tmp_path / "stops.json", {"n10": [-120.481, 37.3]})
+    LocationIndex(str(tmp_path / "stops.json"), graph).node("n10")
+    assert os.path.isfile(os.path.join(path, "stopnodes.json"))
+    rebuilt = line_graph([-120.48, -120.49, -120.50])
+    rebuilt.save(path)
+    assert not os.path.isfile(os.path.join(path, "stopnodes.json"))
+    assert LocationIndex(str(tmp_path / "stops.json"), WalkGraph.load(path)).node("n10") == 1
+
+
+def test_snaps_from_another_graph_fingerprint_are_ignored(tmp_path):
+    path = str(tmp_path / "g.walkgraph")
+    graph = line_graph([-120.50, -120.49, -120.48])
+    graph.save(path)
+    write_stops(tmp_path / "stops.json", {"n10": [-120.481, 37.3]})
+    with open(os.path.join(path, "stopnodes.json"), "w") as f:
+        json.dump({"graph": [3, 4, 0.0], "stops": {"n10": [-120.481, 37.3, 1]}}, f)
+    assert LocationIndex(str(tmp_path / "stops.json"), graph).node("n10") == 3
+
+
+def test_missing_stops_are_fetched_in_one_request_and_saved(tmp_path):
+    graph = line_graph([-120.50, -120.49, -120.48])
+    api = Api({10: (-120.50, 37.3), 11: (-120.48, 37.3)})
+    locations = LocationIndex(str(tmp_path / "stops.json"), graph, api=api)
+    assert locations.nodes(["n10", "n11"]) == {"n10": 1, "n11": 3}
+    assert api.requests == 1
+    with open(tmp_path / "stops.json") as f:
+        assert json.load(f) == {"n10": [-120.50, 37.3], "n11": [-120.48, 37.3]}
+
+
+def test_stop_file_from_a_local_extract(tmp_path):
+    with open(tmp_path / "schedules.json", "w") as f:
+        json.dump({"routes": [{"route_name": "A", "operater": "Merced Bus", "operatingdays": "Weekday",
+                               "stops": [{"OSM_ID": "n10", "times": [480]}, {"OSM_ID": "n11", "times": [490]}]}]}, f)
+    with open(tmp_path / "stops.osm", "w") as f:
+        f.write('<osm><node id="10" lon="-120.5" lat="37.3"/><node id="11" lon="-120.4" lat="37.31"/>'
+                '<node id="12" lon="-120.3" lat="37.32"/></osm>')
+    write_stop_file(str(tmp_path / "schedules.json"), str(tmp_path / "stops.json"), [str(tmp_path / "stops.osm")])
+    with open(tmp_path / "stops.json") as f:
+        assert json.load(f) == {"n10": [-120.5, 37.3], "n11": [-120.4, 37.31]}
+
+
+def test_shipped_stop_file_covers_every_scheduled_stop():
+    path = os.path.join(HERE, "BusSchedules", "stops.json")
+    if not os.path.isfile(path):
+        pytest.skip("BusSchedules/stops.json has not been generated; run python cli.py stops")
+    with open(path, encoding="utf-8") as f:
+        coordinates = json.load(f)
+    stop_ids = Timetable.load(os.path.join(HERE, "BusSchedules", "schedules.json")).stop_ids
+    assert [stop_id for stop_id in stop_ids if stop_id not in coordinates] == []
+    # Every stop is in Merced County
+    assert all(-121.3 < lon < -120.0 and 36.7 < lat < 37.7 for lon, lat in coordinates.values())
@@ -0,0 +1,39 @@
+import json
+import geopandas
+import numpy
+import pandas
+import pytest
+from output import spatial_order, write_columns
+
+
+def features(count, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return geopandas.GeoDataFrame({"element": "way", "id": numpy.arange(count)},
+                                  geometry=geopandas.points_from_xy(rng.uniform(-120.55, -120.45, count),
+                                                                    rng.uniform(37.28, 37.35, count)), crs=4326)
+
+
+def test_spatial_order_is_a_permutation_that_keeps_neighbours_together():
+    gdfclean = features(400)
+    order = spatial_order(gdfclean)
+    assert sorted(order.tolist()) == list(range(400))
+    # Consecutive rows are much closer together than rows in file order
+    points = numpy.column_stack([gdfclean.geometry.x, gdfclean.geometry.y])
+    assert numpy.hypot(*numpy.diff(points[order], axis=0).T).mean() < numpy.hypot(*numpy.diff(points, axis=0).T).mean() / 4
+
+
+@pytest.mark.parametrize("extension", ["parquet", "feather"])
+def test_columns_written_chunk_by_chunk_read_back_with_their_features(tmp_path, extension):
+    gdfclean = features(50)
+    columns = {"Transit": numpy.arange(50) * 1.5, "Transit Routes": [None] * 10 + ["r{}".format(i) for i in range(40)]}
+    path = str(tmp_path / ("out." + extension))
+    writer = write_columns(path, gdfclean, columns, chunk_size=7, geojson=True)
+    assert writer.rows == 50
+    written = geopandas.read_parquet(path) if extension == "parquet" else geopandas.read_feather(path)
+    written = written.sort_values("id").reset_index(drop=True)
+    expected = pandas.concat([gdfclean, pandas.DataFrame(columns)], axis=1)
+    pandas.testing.assert_frame_equal(pandas.DataFrame(written.drop(columns="geometry")),
+                                      pandas.DataFrame(expected.drop(columns="geometry")), check_dtype=False)
+    assert written.geometry.geom_equals(expected.geometry).all() and written.crs == gdfclean.crs
+    with open(tmp_path / "out.geojson") as f:
+        assert len(json.load(f)["features"]) == 50
@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import pyarrow.feather
+import pyarrow.parquet
+import pytest
+import walkgraph
+import walkmatrix
+from pipeline import Options, run
+from walkgraph import WalkGraph
+
+
+@pytest.fixture
+def copied_region(region, tmp_path, region_options):
+    # The region fixture copied so a test can change its inputs, and options for runs on the copy
+    path = str(tmp_path / "region")
+    shutil.copytree(region, path)
+
+    def options(**changes):
+        files = dict(features=os.path.join(path, "buildings.feather"), graphml=os.path.join(path, "graph.graphml"),
+                     bus_database=os.path.join(path, "BusDatabase.feather"), stops=os.path.join(path, "stops.json"))
+        return region_options(**dict(files, **changes))
+    return path, options
+
+
+def fastest(options):
+    messages = []
+    path, = run(options, message=messages.append, warning=lambda text: None)
+    return pyarrow.parquet.read_table(path).to_pandas(), messages
+
+
+def test_second_run_is_read_from_the_cache_without_hashing_the_inputs(copied_region, monkeypatch):
+    path, options = copied_region
+    cold, messages = fastest(options())
+    assert "Results Loaded From Cache" not in messages
+
+    def rehash(*arrays):
+        raise AssertionError("input hashed on a cached run")
+    monkeypatch.setattr(walkgraph, "content_hash", rehash)
+    monkeypatch.setattr(walkmatrix, "content_hash", rehash)
+    cached, messages = fastest(options())
+    assert "Results Loaded From Cache" in messages
+    assert cached.equals(cold)
+
+
+def test_changed_inputs_miss_the_cache(copied_region):
+    path, options = copied_region
+    cold, messages = fastest(options())
+    # The same features saved again
+    buildings = pyarrow.feather.read_table(os.path.join(path, "buildings.feather"))
+    pyarrow.feather.write_feather(buildings, os.path.join(path, "buildings.feather"))
+    rerun, messages = fastest(options())
+    assert "Results Loaded From Cache" not in messages and rerun.equals(cold)
+    # A slower walk graph
+    graph = WalkGraph.load(os.path.join(path, "graph.walkgraph"))
+    WalkGraph(graph.node_ids, graph.x, graph.y, graph.indptr, graph.indices, graph.seconds * 2, graph.rindptr,
+              graph.rindices, graph.rseconds * 2).save(os.path.join(path, "graph.slower"))
+    shutil.rmtree(os.path.join(path, "graph.walkgraph"))
+    os.rename(os.path.join(path, "graph.slower"), os.path.join(path, "graph.walkgraph"))
+    slower, messages = fastest(options())
+    assert "Results Loaded From Cache" not in messages
+    assert (slower["Walking"] >= cold["Walking"]).all() and not slower["Walking"].equals(cold["Walking"])
+    # Longer walks to every stop in the bus database
+    table = pyarrow.feather.read_table(os.path.join(path, "BusDatabase.feather")).to_pandas()
+    stops = [name for name in table.columns if name[0] in "nw" and name[1:].isdigit()]
+    table[stops] = table[stops] * 2
+    table.to_feather(os.path.join(path, "BusDatabase.feather"))
+    farther, messages = fastest(options())
+    assert "Results Loaded From Cache" not in messages and next(text for text in messages if "reused" in text).startswith("0 of")
+    assert (farther["Transit"].fillna(1e9) >= slower["Transit"].fillna(1e9)).all()
+
+
+def test_editing_one_route_only_reroutes_that_route_and_transit(copied_region, tmp_path):
+    path, options = copied_region
+    before, messages = fastest(options())
+    entries = set(os.listdir(tmp_path / "cache"))
+    with open(Options().schedules) as f:
+        schedules = json.load(f)
+    edited = next(route for route in schedules["routes"] if route["operatingdays"] == "Weekday")
+    for stop in edited["stops"]:
+        stop["times"] = [time - 3 for time in stop["times"]]
+    with open(tmp_path / "schedules.json", "w") as f:
+        json.dump(schedules, f)
+    after, messages = fastest(options(schedules=str(tmp_path / "schedules.json"), profile=True))
+    routes = len([route for route in schedules["routes"] if route["operatingdays"] == "Weekday"])
+    assert "{} of {} routes reused from earlier runs".format(routes - 1, routes) in messages
+    with open(tmp_path / "output" / "trace.json") as f:
+        routed = [event["name"] for event in json.load(f)["traceEvents"] if event["name"].startswith("Route ")]
+    assert routed == ["Route " + edited["route_name"]]
+    # New entries for the edited route, Transit and the whole run
+    assert len(set(os.listdir(tmp_path / "cache")) - entries) == 3
+    assert not after[edited["route_name"]].equals(before[edited["route_name"]])
+    cold, messages = fastest(options(schedules=str(tmp_path / "schedules.json"), cache_mb=0, output_folder=str(tmp_path / "cold")))
+    assert after.equals(cold)
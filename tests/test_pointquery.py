@@ -0,0 +1,57 @@
+import numpy
+import pandas
+import pytest
+from pointquery import PointIndex
+from raptor import Raptor, transfer_times
+from timetable import Timetable
+
+
+def network():
+    # Four routes over eight stops on each day type and twelve buildings, each snapped to its own node, with walks
+    # either within the index's walking range or too long to take
+    rng = numpy.random.default_rng(1)
+    stop_ids = ["n{}".format(i) for i in range(8)]
+    routes = []
+    for r in range(8):
+        sequence = rng.choice(8, 4, replace=False)
+        starts = numpy.sort(rng.choice(numpy.arange(420, 720), 6, replace=False))
+        routes.append({"route_name": "R{}".format(r), "operater": "Merced Bus", "operatingdays": ("Weekday", "Weekend")[r % 2],
+                       "stops": [{"OSM_ID": stop_ids[s], "times": (starts + 6 * position).tolist()} for position, s in enumerate(sequence)]})
+    walk = rng.uniform(60, 900, (12, 8)).round()
+    walk[rng.random(walk.shape) < 0.4] = numpy.inf
+    busdatabase = pandas.DataFrame(walk, columns=stop_ids, index=pandas.MultiIndex.from_tuples([("way", i) for i in range(12)]))
+    busdatabase["nearestnode"] = numpy.arange(100, 112)
+    return Timetable(routes), busdatabase
+
+
+@pytest.mark.parametrize("day", PointIndex.days)
+def test_query_matches_a_full_transit_run(day):
+    timetable, busdatabase = network()
+    index = PointIndex.build(timetable, busdatabase)
+    walk = busdatabase[timetable.stop_ids].to_numpy()
+    raptor = Raptor(timetable.routes(day), timetable.stop_ids, transfer_times(walk))
+    reached = 0
+    for time_of_day in (430, 500, 600):
+        for origin in range(12):
+            expected = raptor.travel_times(walk, walk[origin], time_of_day)["Transit"]
+            found = [index.query("w{}".format(origin), "w{}".format(destination), time_of_day, day) for destination in range(12)]
+            numpy.testing.assert_allclose(found, expected, rtol=0, atol=1e-3)
+            reached += numpy.isfinite(expected).sum()
+    assert reached > 0
+
+
+def test_saved_index_answers_the_same(tmp_path):
+    timetable, busdatabase = network()
+    index = PointIndex.build(timetable, busdatabase)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = PointIndex.load(str(tmp_path / "index.npz"))
+    # A destination can be a building or its graph node
+    found = [loaded.query("w{}".format(origin), 100 + destination, 500) for origin in range(12) for destination in range(12)]
+    expected = [index.query("w{}".format(origin), "w{}".format(destination), 500) for origin in range(12) for destination in range(12)]
+    numpy.testing.assert_array_equal(found, expected)
+
+
+def test_unknown_building_is_a_key_error():
+    index = PointIndex.build(*network())
+    with pytest.raises(KeyError):
+        index.query("w99", "w0", 500)
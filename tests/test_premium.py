@@ -0,0 +1,36 @@
+import numpy
+from output import read_columns
+from pipeline import run
+from utils import transit_premium
+
+
+def test_premium_is_walking_minus_transit_and_ratio_is_transit_over_walking():
+    walking = numpy.array([30.0, 20.0, 10.0, numpy.nan, 0.0])
+    transit = numpy.array([12.0, numpy.inf, numpy.nan, 5.0, 3.0])
+    with numpy.errstate(invalid="ignore"):
+        premium = transit_premium(walking, transit)
+    numpy.testing.assert_allclose(premium["Transit Premium"], [18, -numpy.inf, numpy.nan, numpy.nan, -3])
+    numpy.testing.assert_allclose(premium["Transit Ratio"], [0.4, numpy.inf, numpy.nan, numpy.nan, numpy.nan])
+
+
+def test_pipeline_writes_the_premium_of_each_building(region_options):
+    options = region_options(mode="Public Transit Premium")
+    paths = run(options, message=lambda text: None, warning=lambda text: None)
+    table = read_columns(paths[0], ["Walking", "Transit", "Transit Premium", "Transit Ratio"])
+    numpy.testing.assert_allclose(table["Transit Premium"], table["Walking"] - table["Transit"])
+    walks = table["Walking"] > 0
+    numpy.testing.assert_allclose(table["Transit Ratio"][walks], (table["Transit"] / table["Walking"])[walks])
+    # Buildings on the destination's own node have no walk to compare against
+    assert (~walks).any() and table["Transit Ratio"][~walks].isna().all()
+    # No bus leaves after 23:50, so nothing is reachable by transit
+    paths = run(region_options(mode="Public Transit Premium", time_of_day=1430), message=lambda text: None, warning=lambda text: None)
+    table = read_columns(paths[0], ["Transit", "Transit Premium", "Transit Ratio"])
+    assert table.notna().sum().tolist() == [0, 0, 0]
+
+
+def test_walking_only_selection_warns_before_computing_anything(region_options):
+    messages, warnings = [], []
+    options = region_options(mode="Public Transit Premium", modes=["Walking"])
+    assert run(options, message=messages.append, warning=warnings.append) == []
+    assert warnings[-1:] == ["Public Transit Premium needs at least one bus mode and day selected"]
+    assert "Walking Distance Calculation Starting" not in messages
@@ -0,0 +1,21 @@
+import numpy
+import pytest
+from raptor import Raptor, transfer_times
+from tests.networks import toy_network
+
+
+@pytest.mark.parametrize("origin", [True, False])
+def test_profile_matches_one_query_per_departure(origin):
+    routes, stop_ids, walk = toy_network(1)
+    raptor = Raptor(routes, stop_ids, transfer_times(walk))
+    walking = numpy.linspace(20, 120, len(walk))
+    departures, traveltimes, modes, summary = raptor.profile(walk, walk[0], 480, 600, 15, origin=origin, walking=walking)
+    assert departures.tolist() == list(range(480, 601, 15))
+    for t, departure in enumerate(departures):
+        transit = raptor.travel_times(walk, walk[0], departure, origin=origin)
+        walks = ~(transit["Transit"] <= walking)
+        numpy.testing.assert_allclose(traveltimes[:, t], numpy.where(walks, walking, transit["Transit"]))
+        assert (modes[walks, t] == "Walking").all()
+        assert modes[~walks, t].tolist() == transit["Transit Routes"][~walks].tolist()
+    numpy.testing.assert_allclose(summary["Median"], numpy.nanmedian(traveltimes, axis=1))
+    numpy.testing.assert_allclose(summary["Fastest"], numpy.nanmin(traveltimes, axis=1))
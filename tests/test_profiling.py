@@ -0,0 +1,69 @@
+import json
+import os
+import profiling
+from pipeline import run
+from profiling import Profiler
+
+
+def test_spans_nest_and_counters_add_up():
+    messages, labels = [], []
+    profiler = Profiler(message=messages.append, progressor=lambda label, position, total: labels.append(label))
+    profiler.stage("Load")
+    with profiler.span("Outer", routes=3):
+        with profiler.span("Inner"):
+            pass
+    profiler.count("searches")
+    profiler.count("searches", 4)
+    profiler.rate("buildings per second", 100, 2)
+    profiler.stage()
+    assert [(event["name"], event["args"]["depth"]) for event in profiler.events] == [("Inner", 2), ("Outer", 1), ("Load", 0)]
+    assert profiler.events[1]["args"]["routes"] == 3
+    inner, outer, load = profiler.events
+    assert load["ts"] <= outer["ts"] <= inner["ts"] and inner["dur"] <= outer["dur"] <= load["dur"]
+    assert profiler.counters == {"searches": 5, "buildings per second": 50}
+    assert labels == ["Load"] and messages[0].startswith("    Inner: ") and messages[-1].startswith("Load: ")
+
+
+def test_trace_is_chrome_trace_json(tmp_path):
+    profiler = Profiler()
+    with profiler.span("Route", stops=12):
+        profiler.count("cache_hits")
+    profiler.save(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)
+    assert trace["displayTimeUnit"] == "ms" and trace["otherData"] == {"counters": {"cache_hits": 1}}
+    event, = trace["traceEvents"]
+    assert event["ph"] == "X" and event["name"] == "Route" and event["args"] == {"stops": 12, "depth": 0}
+    assert event["pid"] == os.getpid() and isinstance(event["tid"], int)
+    assert event["ts"] >= 0 and event["dur"] >= 0
+
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    labels = []
+    profiler = Profiler(enabled=False, message=labels.append, progressor=lambda label, position, total: labels.append(label))
+    profiler.stage("Load")
+    with profiler.span("Outer"):
+        profiler.count("searches")
+        profiler.add_span("Worker", 0, 1)
+    profiler.rate("buildings per second", 100, 2)
+    profiler.stage()
+    profiler.save(str(tmp_path / "trace.json"))
+    assert profiler.events == [] and profiler.counters == {}
+    assert not os.path.exists(tmp_path / "trace.json")
+    # The stage still labels the progressor
+    assert labels == ["Load"]
+
+
+def test_pipeline_traces_its_stages_only_when_profiling(region_options):
+    options = region_options(profile=True)
+    run(options, message=lambda text: None, warning=lambda text: None)
+    with open(os.path.join(options.output_folder, "trace.json")) as f:
+        trace = json.load(f)
+    stages = [event["name"] for event in trace["traceEvents"] if event["args"]["depth"] == 0]
+    assert stages[:4] == ["Load timetable", "Load walk graph", "Load walk matrix", "Load features"] and stages[-1] == "Fastest Mode"
+    assert trace["otherData"]["counters"]["buildings"] == 200 and trace["otherData"]["counters"]["dijkstra_searches"] >= 1
+    # The run's profiler is only active for the run
+    assert not profiling.active.enabled
+    options = region_options(profile=False, output_folder=options.output_folder + "2")
+    run(options, message=lambda text: None, warning=lambda text: None)
+    assert not os.path.exists(os.path.join(options.output_folder, "trace.json"))
@@ -0,0 +1,78 @@
+import numpy
+import pytest
+from raptor import Raptor, transfer_times
+from tests.networks import toy_network
+from utils import CalculateArriveByTimes, CalculateTravelTimes, Route, Stop
+
+
+def next_time(times, after):
+    later = [t for t in times if t > after]
+    return min(later) if later else numpy.inf
+
+
+def brute_force_stops(routes, stop_ids, transfers, start, rides):
+    # Earliest arrival at each stop over every sequence of up to rides rides, each optionally followed by one
+    # walking transfer, by trying every boarding and alighting position
+    best = numpy.full(len(stop_ids), numpy.inf)
+
+    def extend(labels, left):
+        if left == 0:
+            return
+        for route in routes:
+            for a, boarding in enumerate(route.stops):
+                departure = next_time(boarding.times, labels[stop_ids.index(boarding.OSM_ID)])
+                for alighting in route.stops:
+                    arrival = next_time(alighting.times, departure)
+                    stop = stop_ids.index(alighting.OSM_ID)
+                    reached = numpy.full(len(stop_ids), numpy.inf)
+                    reached[stop] = arrival
+                    reached = numpy.minimum(reached, arrival + transfers[stop] / 60)
+                    numpy.minimum(best, reached, out=best)
+                    if numpy.isfinite(reached).any():
+                        extend(numpy.minimum(labels, reached), left - 1)
+
+    extend(start, rides)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_transit_matches_brute_force(seed):
+    routes, stop_ids, walk = toy_network(seed)
+    transfers = transfer_times(walk)
+    raptor = Raptor(routes, stop_ids, transfers)
+    destinationwalk = walk[0]
+    transit = raptor.travel_times(walk, destinationwalk, 450, max_transfers=1)["Transit"]
+    stops = brute_force_stops(routes, stop_ids, transfers, 450 + destinationwalk / 60, 2)
+    expected = numpy.min(stops[None, :] + walk / 60, axis=1) - 450
+    numpy.testing.assert_allclose(numpy.nan_to_num(transit, nan=numpy.inf), expected)
+
+
+def test_loop_route_can_be_ridden_back_to_the_boarding_stop():
+    # Only n0 is in walking distance of both ends, so the only trip rides the loop from n0 back to n0
+    route = Route("Weekday", "Loop", "Merced Bus", [Stop("n0", [500, 530]), Stop("n1", [510, 540]), Stop("n2", [520, 550])])
+    walk = numpy.array([[120, numpy.inf, numpy.inf]])
+    raptor = Raptor([route], ["n0", "n1", "n2"])
+    with numpy.errstate(invalid="ignore"):
+        expected = CalculateTravelTimes(walk[0], walk, route, 480)[0], CalculateArriveByTimes(walk, walk[0], route, 560)[0]
+    assert raptor.travel_times(walk, walk[0], 480)["Transit"][0] == pytest.approx(expected[0])
+    assert raptor.travel_times(walk, walk[0], 560, origin=False)["Transit"][0] == pytest.approx(expected[1])
+
+
+@pytest.mark.parametrize("origin", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_transit_is_never_slower_than_a_single_route(seed, origin):
+    routes, stop_ids, walk = toy_network(seed)
+    raptor = Raptor(routes, stop_ids, transfer_times(walk))
+    for time_of_day in range(420, 661, 20):
+        transit = raptor.travel_times(walk, walk[0], time_of_day, origin=origin)["Transit"]
+        transit = numpy.nan_to_num(transit, nan=numpy.inf)
+        for route in routes:
+            columns = [stop_ids.index(stop.OSM_ID) for stop in route.stops]
+            with numpy.errstate(invalid="ignore"):
+                if origin:
+                    times = CalculateTravelTimes(walk[0, columns], walk[:, columns], route, time_of_day)
+                else:
+                    times = CalculateArriveByTimes(walk[:, columns], walk[0, columns], route, time_of_day)
+            # 10000000000 (or NaN past an unreachable stop) is the route kernel's no trip
+            trips = times < 10000000000.0
+            assert (transit[trips] <= times[trips] + 1e-9).all()
@@ -0,0 +1,62 @@
+import os
+import numpy
+import pandas
+import pytest
+from resultcache import ResultCache, content_hash
+
+
+def columns(n):
+    return pandas.DataFrame({"Transit": numpy.arange(n) * 1.5, "Transit Routes": ["r{}".format(i) if i % 3 else None for i in range(n)]})
+
+
+def test_entry_written_per_chunk_reads_back_in_any_row_order(tmp_path):
+    cache = ResultCache(str(tmp_path), 1024 ** 2)
+    table = columns(10)
+    order = numpy.random.default_rng(0).permutation(10)
+    with cache.writer("k") as writer:
+        for start in range(0, 10, 4):
+            rows = order[start:start + 4]
+            writer.write(rows, table.iloc[rows])
+    entry = cache.get("k")
+    assert len(entry) == 10 and entry.columns == ["Transit", "Transit Routes"]
+    pandas.testing.assert_frame_equal(entry.rows(), table)
+    pandas.testing.assert_frame_equal(entry.rows([7, 2], ["Transit"]), table.iloc[[7, 2]][["Transit"]].reset_index(drop=True))
+
+
+def test_put_then_get_is_a_hit(tmp_path):
+    cache = ResultCache(str(tmp_path), 1024 ** 2)
+    assert cache.get("k") is None
+    cache.put("k", columns(5))
+    pandas.testing.assert_frame_equal(cache.get("k").rows(), columns(5))
+
+
+def test_content_hash_sees_values_and_shape():
+    values = numpy.arange(6.0)
+    assert content_hash(values) == content_hash(values.copy())
+    assert content_hash(values) != content_hash(values.reshape(2, 3))
+    assert content_hash(values) != content_hash(values + 1)
+
+
+def test_entry_is_discarded_when_the_run_fails(tmp_path):
+    cache = ResultCache(str(tmp_path), 1024 ** 2)
+    with pytest.raises(RuntimeError):
+        with cache.writer("k") as writer:
+            writer.write([0, 1], columns(2))
+            raise RuntimeError
+    assert cache.get("k") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), 1)
+    cache.put("old", columns(100))
+    cache.put("new", columns(100))
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+
+def test_disabled_cache_writes_nothing(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 0)
+    cache.put("k", columns(5))
+    assert cache.get("k") is None
+    assert not os.path.exists(tmp_path / "cache")
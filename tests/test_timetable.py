@@ -0,0 +1,45 @@
+import os
+import pytest
+from timetable import Timetable
+
+SCHEDULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "BusSchedules", "schedules.json")
+
+
+def route(name, days="Weekday", stops=(("n1", [480, 540]), ("n2", [490, 550]))):
+    return {"route_name": name, "operater": "Merced Bus", "operatingdays": days,
+            "stops": [{"OSM_ID": stop_id, "times": times} for stop_id, times in stops]}
+
+
+def test_shipped_schedules_have_unique_route_names():
+    timetable = Timetable.load(SCHEDULES)
+    assert len(set(timetable.route_names)) == len(timetable.route_names)
+
+
+def test_duplicate_name_on_the_other_day_set_is_rejected():
+    with pytest.raises(ValueError, match="already used"):
+        Timetable([route("M6 Weekend", "Weekday"), route("M6 Weekend", "Weekend")])
+
+
+def test_unsorted_times_are_sorted_with_a_warning():
+    timetable = Timetable([route("A", stops=(("n1", [540, 480]), ("n2", [490, 550])))])
+    assert timetable.row_times(0).tolist() == [480, 540]
+    assert len(timetable.warnings) == 1
+
+
+@pytest.mark.parametrize("stops", [(("x1", [480]),), (("n1", [1.5]),), (("n1", [-1]),)])
+def test_bad_stops_are_rejected(stops):
+    with pytest.raises(ValueError):
+        Timetable([route("A", stops=stops)])
+
+
+def test_route_hash_only_changes_for_the_edited_route():
+    before = Timetable([route("A"), route("B")]).route_hashes()
+    after = Timetable([route("A"), route("B", stops=(("n1", [480, 541]), ("n2", [490, 550])))]).route_hashes()
+    assert before[("Weekday", "A")] == after[("Weekday", "A")]
+    assert before[("Weekday", "B")] != after[("Weekday", "B")]
+
+
+def test_next_departure_is_strictly_after():
+    timetable = Timetable([route("A")])
+    assert timetable.next_departure(0, 480) == 540
+    assert timetable.next_departure(0, 540) == float("inf")
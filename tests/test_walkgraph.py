@@ -0,0 +1,41 @@
+import os
+import networkx
+import numpy
+import osmnx
+from tests.networks import random_graph
+from walkgraph import WalkGraph, load_walk_graph
+
+
+def test_walk_seconds_match_networkx():
+    graph = random_graph(0)
+    # A longer parallel edge is never the one a search uses
+    a, b = list(graph.edges())[0]
+    graph.add_edge(a, b, length=graph.edges[a, b, 0]["length"] + 500)
+    walk = WalkGraph.from_networkx(graph, speed_kph=5)
+    seconds = networkx.single_source_dijkstra_path_length(graph.reverse(), a, weight="length")
+    expected = numpy.full(len(walk.node_ids), numpy.inf)
+    for node, metres in seconds.items():
+        expected[walk.node_index([node])[0]] = metres * 3.6 / 5
+    numpy.testing.assert_allclose(walk.walk_seconds(a), expected)
+
+
+def test_compiled_graph_is_reused_until_the_graphml_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "g.graphml")
+    networkx.write_graphml(random_graph(1), path)
+    parsed = []
+
+    def load_graphml(filepath):
+        parsed.append(filepath)
+        return networkx.read_graphml(filepath, node_type=int, force_multigraph=True)
+
+    monkeypatch.setattr(osmnx, "load_graphml", load_graphml, raising=False)
+    first = load_walk_graph(path)
+    assert load_walk_graph(path).fingerprint() == first.fingerprint()
+    assert len(parsed) == 1
+    # A newer GraphML or another walking speed is compiled again
+    networkx.write_graphml(random_graph(2, nodes=30), path)
+    later = os.path.getmtime(os.path.join(str(tmp_path), "g.walkgraph", "meta.json")) + 10
+    os.utime(path, (later, later))
+    assert len(load_walk_graph(path).node_ids) == 30
+    assert load_walk_graph(path, speed_kph=4).speed_kph == 4
+    assert len(parsed) == 3
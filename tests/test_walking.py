@@ -0,0 +1,66 @@
+import os
+import geopandas
+import networkx
+import numpy
+import pandas
+from profiling import Profiler, profiling
+from tests.networks import random_graph
+from walkgraph import WalkGraph
+from walking import precompute_walk_table, walk_times_to_node
+
+
+def test_compiled_graph_and_networkx_give_the_same_walking_column():
+    graph = random_graph(3)
+    for u, v, data in graph.edges(data=True):
+        data["travel_time"] = data["length"] * 3.6 / 5
+    target = list(graph.nodes)[0]
+    # Repeated and unreachable nodes, and one the graph does not have
+    graph.add_node(1, x=-120.5, y=37.3)
+    nodes = list(graph.nodes) + list(graph.nodes)[:5] + [2]
+    compiled = walk_times_to_node(WalkGraph.from_networkx(graph), nodes, target)
+    expected = walk_times_to_node(graph, nodes, target)
+    numpy.testing.assert_allclose(compiled, expected)
+    lengths = networkx.single_source_dijkstra_path_length(graph.reverse(), target, weight="travel_time")
+    assert numpy.isnan(compiled[nodes.index(1)]) and numpy.isnan(compiled[-1])
+    assert numpy.isfinite(compiled).sum() == len(lengths) + sum(node in lengths for node in nodes[len(graph):-1])
+
+
+def buildings(graph, count, seed=0):
+    # count buildings on random graph nodes, laid out like the cleaned feature table
+    rng = numpy.random.default_rng(seed)
+    nodes = rng.choice(list(graph.nodes), count)
+    return geopandas.GeoDataFrame({"element": "way", "id": numpy.arange(count), "nearestnode": nodes},
+                                  geometry=geopandas.points_from_xy(rng.random(count), rng.random(count)), crs=4326)
+
+
+def precompute(graph, features, stop_nodes, checkpoint):
+    # The table and how many stops it had to compute
+    with profiling(Profiler()) as profiler:
+        table = precompute_walk_table(graph, features, stop_nodes, checkpoint, processes=2)
+    return table, profiler.counters["walk_table_stops_computed"]
+
+
+def test_checkpoint_only_recomputes_missing_and_moved_stops(tmp_path):
+    network = random_graph(4)
+    graph = WalkGraph.from_networkx(network)
+    features = buildings(network, 60)
+    stop_nodes = {"n{}".format(i): node for i, node in enumerate(list(network.nodes)[:6])}
+    checkpoint = str(tmp_path / "checkpoint")
+    table, computed = precompute(graph, features, stop_nodes, checkpoint)
+    assert computed == 6
+    assert precompute(graph, features, stop_nodes, checkpoint)[1] == 0
+    # One stop's result is lost and another stop is moved to a different node
+    os.remove(os.path.join(checkpoint, "n2.npy"))
+    stop_nodes["n3"] = list(network.nodes)[10]
+    resumed, computed = precompute(graph, features, stop_nodes, checkpoint)
+    assert computed == 2
+    pandas.testing.assert_frame_equal(resumed, precompute(graph, features, stop_nodes, str(tmp_path / "fresh"))[0])
+    assert not resumed["n3"].equals(table["n3"])
+    # The same streets walked more slowly start over
+    slower = WalkGraph(graph.node_ids, graph.x, graph.y, graph.indptr, graph.indices, graph.seconds * 1.25,
+                       graph.rindptr, graph.rindices, graph.rseconds * 1.25, speed_kph=4)
+    table, computed = precompute(slower, features, stop_nodes, checkpoint)
+    assert computed == 6
+    pandas.testing.assert_frame_equal(table, precompute(slower, features, stop_nodes, str(tmp_path / "slower"))[0])
+    # So do buildings snapped to a different set of nodes
+    assert precompute(slower, features.iloc[:20], stop_nodes, checkpoint)[1] == 6
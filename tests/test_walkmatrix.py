@@ -0,0 +1,53 @@
+import os
+import numpy
+import pandas
+import pyarrow.feather
+import pytest
+from walkmatrix import WalkMatrix, load_walk_matrix
+
+
+def busdatabase(shift=0):
+    # Five buildings on four nodes (the first two share one, so they share walks), some stops unreachable or too far
+    index = pandas.MultiIndex.from_tuples([("way", 1), ("way", 2), ("node", 1), ("relation", 9), ("way", 7)],
+                                          names=["element", "id"])
+    table = pandas.DataFrame({"n10": [60.4, 60.4, 300, 70000, numpy.nan], "w11": [120, 120, numpy.nan, 5, 8]}, index=index)
+    table["n10"] += shift
+    table["nearestnode"] = [5, 5, 6, 7, 8]
+    return table
+
+
+def test_walks_are_looked_up_per_building():
+    matrix = WalkMatrix.from_table(busdatabase(), ["n10", "w11"])
+    assert len(matrix.nodes) == 4
+    walk = matrix.walk([("w", 2), ("n", 1), ("r", 9), ("w", 3)], ["w11", "n10"])
+    numpy.testing.assert_array_equal(walk, [[120, 60], [numpy.nan, 300], [5, numpy.nan], [numpy.nan, numpy.nan]])
+    numpy.testing.assert_array_equal(matrix.building_walk(("way", 7), ["n10", "w11"]), [numpy.nan, 8])
+    with pytest.raises(KeyError):
+        matrix.building_walk(("way", 3), ["n10"])
+
+
+def test_compiled_matrix_is_reused_until_the_feather_changes(tmp_path):
+    path = str(tmp_path / "BusDatabase.feather")
+    pyarrow.feather.write_feather(busdatabase(), path)
+    first = load_walk_matrix(path)
+    meta = os.path.join(first.path, "meta.json")
+    built = os.path.getmtime(meta)
+    assert load_walk_matrix(path).walk([("w", 1)], ["n10"]).tolist() == [[60]]
+    assert os.path.getmtime(meta) == built
+    pyarrow.feather.write_feather(busdatabase(shift=100), path)
+    os.utime(path, (built + 10, built + 10))
+    assert load_walk_matrix(path).walk([("w", 1)], ["n10"]).tolist() == [[160]]
+    assert load_walk_matrix(path).stop_ids == ["n10", "w11"]
+
+
+def test_digest_only_changes_with_the_walks_to_its_own_stops(tmp_path):
+    matrix = WalkMatrix.from_table(busdatabase(), ["n10", "w11"])
+    matrix.save(str(tmp_path / "matrix"))
+    loaded = WalkMatrix.load(str(tmp_path / "matrix"))
+    assert loaded.hashes() == matrix.hashes()
+    table = busdatabase()
+    table["w11"] += 1
+    changed = WalkMatrix.from_table(table, ["n10", "w11"])
+    assert changed.digest(["n10"]) == loaded.digest(["n10"])
+    assert changed.digest(["n10", "w11"]) != loaded.digest(["n10", "w11"])
+    assert loaded.digest(["w11", "n10"]) != loaded.digest(["n10", "w11"])
@@ -0,0 +1,58 @@
+import networkx
+import numpy
+import pytest
+import scipy.sparse.csgraph
+import scipy.spatial
+from walkgraph import WalkGraph
+from walkscore import walking_score
+
+
+@pytest.fixture(scope="module")
+def graph():
+    # Random street-like network whose edge lengths are up to 40% shorter than the straight line between their
+    # ends, so the search's distance bound has to come from the graph rather than from geometry
+    rng = numpy.random.default_rng(3)
+    x, y = rng.uniform(-120.55, -120.45, 800), rng.uniform(37.28, 37.35, 800)
+    network = networkx.MultiDiGraph()
+    for i in range(len(x)):
+        network.add_node(i + 1, x=x[i], y=y[i])
+    points = numpy.column_stack([x * 0.8, y])
+    for i, j in scipy.spatial.cKDTree(points).query_pairs(0.005):
+        length = numpy.hypot(*(points[i] - points[j])) * 111000 * rng.uniform(0.6, 1.5)
+        network.add_edge(i + 1, j + 1, length=length)
+        network.add_edge(j + 1, i + 1, length=length * rng.uniform(0.9, 1.1))
+    return WalkGraph.from_networkx(network)
+
+
+def brute_force(graph, nodes, weights, thresholds):
+    index = graph.node_index(nodes)
+    seconds = scipy.sparse.csgraph.dijkstra(graph.matrix(), indices=index)[:, index]
+    return numpy.stack([(seconds <= threshold * 60) @ weights - weights for threshold in thresholds], axis=1)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_matches_full_dijkstra(graph, processes):
+    rng = numpy.random.default_rng(4)
+    nodes = rng.choice(graph.node_ids, 500)
+    weights = rng.uniform(0, 2, 500)
+    scores = walking_score(graph, nodes, weights, [10, 2, 5], processes=processes, chunk_size=16)
+    assert numpy.allclose(scores, brute_force(graph, nodes, weights, [2, 5, 10]))
+
+
+def test_seconds_within_matches_full_search(graph):
+    sources = numpy.arange(0, 40, 3)
+    local, seconds = graph.seconds_within(sources, 300)
+    full = scipy.sparse.csgraph.dijkstra(graph.matrix(), indices=sources, limit=300)
+    assert numpy.array_equal(numpy.isfinite(full).sum(axis=1), numpy.isfinite(seconds).sum(axis=1))
+    assert numpy.allclose(full[:, local], seconds)
+
+
+def test_empty_input(graph):
+    assert walking_score(graph, [], [], [5, 10]).shape == (0, 2)
+
+
+def test_nodes_missing_from_the_graph_get_no_score(graph):
+    nodes = numpy.append(graph.node_ids[:20], -1)
+    scores = walking_score(graph, nodes, numpy.ones(21), [5, 10], processes=1)
+    assert numpy.isnan(scores[-1]).all()
+    assert numpy.allclose(scores[:-1], brute_force(graph, nodes[:-1], numpy.ones(20), [5, 10]))
@@ -0,0 +1,26 @@
+import numpy
+import pytest
+from tests.networks import toy_network
+from utils import CalculateArriveByTimes, CalculateTravelTimes
+from workers import TravelTimePool
+
+
+@pytest.mark.parametrize("origin", [True, False])
+def test_pool_matches_the_kernel_chunk_by_chunk(origin):
+    routes, stop_ids, walk = toy_network(0)
+    pool = TravelTimePool(walk, stop_ids, routes, processes=2, chunk_size=7)
+    try:
+        for start, stop in ((0, 20), (5, 13)):
+            found = pool.route_times(walk[0], 500, origin=origin, start=start, stop=stop)
+            for route in routes:
+                columns = [stop_ids.index(stop.OSM_ID) for stop in route.stops]
+                with numpy.errstate(invalid="ignore"):
+                    if origin:
+                        expected = CalculateTravelTimes(walk[0, columns], walk[start:stop, columns], route, 500)
+                    else:
+                        expected = CalculateArriveByTimes(walk[start:stop, columns], walk[0, columns], route, 500)
+                numpy.testing.assert_array_equal(found[route.route_name], expected)
+        # One task per route and chunk_size rows: three chunks for 0:20, two for 5:13
+        assert pool.stats["tasks"] == len(routes) * 5
+    finally:
+        pool.close()
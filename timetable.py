@@ -0,0 +1,112 @@
+import hashlib
+import json
+import numpy
+from utils import Route, Stop
+
+
+class Timetable:
+    # All routes in one set of flat arrays. Stop IDs are interned to integer indices and every (route, stop) pair is
+    # a row of sorted, unique minutes: row r covers times[time_offsets[r]:time_offsets[r + 1]], and route i covers
+    # rows route_offsets[i]:route_offsets[i + 1]. The schedules list times per stop rather than per trip, so a row is
+    # one stop's departures for the day.
+    def __init__(self, routes: [dict]):
+        self.route_names = []
+        self.operaters = []
+        self.operatingdays = []
+        self.stop_ids = []
+        self.stop_index = {}
+        self.warnings = []
+        route_offsets = [0]
+        row_stops = []
+        rows = []
+        for routeindex, route in enumerate(routes):
+            for key in ("route_name", "operater", "operatingdays", "stops"):
+                if key not in route:
+                    raise ValueError("Route " + str(routeindex) + " is missing " + key)
+            name = route["route_name"]
+            if route["operatingdays"] not in ("Weekday", "Weekend"):
+                raise ValueError(name + ": operatingdays must be Weekday or Weekend, not " + str(route["operatingdays"]))
+            # Names must be unique across both day sets, since results are keyed by route name and a run can
+            # select Weekday and Weekend routes together
+            if name in self.route_names:
+                days = self.operatingdays[self.route_names.index(name)]
+                raise ValueError(name + ": route name is already used by a " + days + " route")
+            if len(route["stops"]) == 0:
+                raise ValueError(name + ": route has no stops")
+            for stop in route["stops"]:
+                stop_id = stop.get("OSM_ID")
+                if not isinstance(stop_id, str) or stop_id[:1] not in ("n", "w") or not stop_id[1:].isdigit():
+                    raise ValueError(name + ": bad stop id " + repr(stop_id))
+                times = numpy.asarray(stop.get("times", []))
+                if times.ndim != 1 or (len(times) and not numpy.issubdtype(times.dtype, numpy.integer)):
+                    raise ValueError(name + ": times at " + stop_id + " must be a list of whole minutes")
+                if len(times) and (times.min() < 0 or times.max() >= 48 * 60):
+                    raise ValueError(name + ": times at " + stop_id + " must be minutes after midnight")
+                sortedtimes = numpy.unique(times)
+                if len(sortedtimes) != len(times) or not numpy.array_equal(sortedtimes, times):
+                    self.warnings.append(name + ": times at " + stop_id + " were not sorted and unique; sorted on load")
+                row_stops.append(self.stop_index.setdefault(stop_id, len(self.stop_index)))
+                rows.append(sortedtimes.astype(numpy.int32))
+            self.route_names.append(name)
+            self.operaters.append(route["operater"])
+            self.operatingdays.append(route["operatingdays"])
+            route_offsets.append(len(row_stops))
+        self.stop_ids = list(self.stop_index)
+        self.route_offsets = numpy.array(route_offsets, dtype=numpy.int64)
+        self.row_stops = numpy.array(row_stops, dtype=numpy.int32)
+        self.time_offsets = numpy.concatenate([[0], numpy.cumsum([len(row) for row in rows])]).astype(numpy.int64)
+        self.times = numpy.concatenate(rows) if rows else numpy.zeros(0, dtype=numpy.int32)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("routes"), list):
+            raise ValueError(path + ": expected an object with a routes list")
+        return cls(data["routes"])
+
+    def hash(self):
+        # Changes whenever any route, stop or time changes, for keying cached results
+        digest = hashlib.sha256(json.dumps([self.route_names, self.operaters, self.operatingdays,
+                                            self.stop_ids]).encode())
+        for array in (self.route_offsets, self.row_stops, self.time_offsets, self.times):
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def route_hash(self, routeindex: int):
+        # Changes only when this route's name, operator, days, stop sequence or times change, so results for the
+        # routes an edited schedule leaves alone stay valid
+        rows = self.route_rows(routeindex)
+        digest = hashlib.sha256(json.dumps([self.route_names[routeindex], self.operaters[routeindex],
+                                            self.operatingdays[routeindex],
+                                            [self.stop_ids[self.row_stops[row]] for row in rows]]).encode())
+        digest.update(numpy.diff(self.time_offsets[rows.start:rows.stop + 1]).tobytes())
+        digest.update(self.times[self.time_offsets[rows.start]:self.time_offsets[rows.stop]].tobytes())
+        return digest.hexdigest()
+
+    def route_hashes(self):
+        # Route hash by (operatingdays, route_name), the pair that identifies a route
+        return {(self.operatingdays[i], self.route_names[i]): self.route_hash(i) for i in range(len(self.route_names))}
+
+    def row_times(self, row: int):
+        return self.times[self.time_offsets[row]:self.time_offsets[row + 1]]
+
+    def next_departure(self, row: int, after):
+        # First time strictly after `after` in one row by binary search, inf when the row has no later time
+        times = self.row_times(row)
+        index = numpy.searchsorted(times, after, side="right")
+        return numpy.append(times, numpy.inf)[index]
+
+    def route_rows(self, routeindex: int):
+        return range(self.route_offsets[routeindex], self.route_offsets[routeindex + 1])
+
+    def route_indices(self, operatingdays: str = None, operaters: [str] = None):
+        return [i for i in range(len(self.route_names))
+                if (operatingdays is None or self.operatingdays[i] == operatingdays)
+                and (operaters is None or self.operaters[i] in operaters)]
+
+    def routes(self, operatingdays: str = None, operaters: [str] = None):
+        # Route/Stop views over the store for the travel time kernels, the worker pool and the transit router
+        return [Route(self.operatingdays[i], self.route_names[i], self.operaters[i],
+                      [Stop(self.stop_ids[self.row_stops[row]], self.row_times(row)) for row in self.route_rows(i)])
+                for i in self.route_indices(operatingdays, operaters)]
@@ -1,5 +1,7 @@
 ﻿import osmnx
 import geopandas
+import numpy
+import pandas
 class Stop:
     def __init__(self, OSM_ID: str, times: [int]):
         self.OSM_ID = OSM_ID
@@ -42,4 +44,95 @@ def CalculateTravelTime(busdatabase: geopandas.GeoDataFrame, currentroute: Route
             traveltime = walktofirststoptime+ waitforbustime + onthebustime + walktodestinationtime
             if traveltime < besttraveltime:
                 besttraveltime = traveltime
-    return besttraveltime
\ No newline at end of file
+    return besttraveltime
+
+
+class RouteTimes:
+    # Array form of a Route for the batched kernel. CalculateTravelTime takes the first listed time after a given
+    # time, which for the running maximum of the list is a searchsorted even when the list is not sorted.
+    def __init__(self, route: Route):
+        self.route = route
+        self.stop_ids = [stop.OSM_ID for stop in route.stops]
+        self.times = [numpy.asarray(stop.times, dtype=float) for stop in route.stops]
+        self.running_max = [numpy.maximum.accumulate(times) if len(times) else times for times in self.times]
+        self.sorted_times = [numpy.sort(times) for times in self.times]
+
+    def next_time(self, stop_index: int, after):
+        times = self.times[stop_index]
+        if len(times) == 0:
+            return numpy.zeros(numpy.shape(after))
+        index = numpy.searchsorted(self.running_max[stop_index], after, side="right")
+        return numpy.where(index < len(times), times[numpy.minimum(index, len(times) - 1)], 0)
+
+    def previous_time(self, stop_index: int, before, inclusive: bool = False):
+        # Latest listed time before before (or at it with inclusive), -inf if there is none
+        times = self.sorted_times[stop_index]
+        if len(times) == 0:
+            return numpy.full(numpy.shape(before), -numpy.inf)
+        index = numpy.searchsorted(times, before, side="right" if inclusive else "left") - 1
+        return numpy.where(index >= 0, times[numpy.maximum(index, 0)], -numpy.inf)
+
+
+def node_key(node: str):
+    return (node[0], int(node[1:]))
+
+
+def building_keys(gdfclean: geopandas.GeoDataFrame):
+    return pandas.MultiIndex.from_arrays([gdfclean["element"].str[0], gdfclean["id"]])
+
+
+def walk_matrix(busdatabase: geopandas.GeoDataFrame, keys, currentroute: Route):
+    # Walking seconds from each key to each stop of the route, in route stop order
+    stop_ids = [stop.OSM_ID for stop in currentroute.stops]
+    if not isinstance(keys, pandas.MultiIndex):
+        keys = pandas.MultiIndex.from_tuples(keys)
+    return busdatabase[stop_ids].reindex(keys).to_numpy(dtype=float)
+
+
+def CalculateTravelTimes(orginwalk, destinationwalk, currentroute, time_of_day: float):
+    # Batched CalculateTravelTime. orginwalk and destinationwalk are walking seconds to each stop of the route with
+    # shape (buildings, stops); either may be a single row, which is broadcast against the other.
+    route = currentroute if isinstance(currentroute, RouteTimes) else RouteTimes(currentroute)
+    orginwalk = numpy.atleast_2d(numpy.asarray(orginwalk, dtype=float))
+    destinationwalk = numpy.atleast_2d(numpy.asarray(destinationwalk, dtype=float))
+    besttraveltime = numpy.full(max(len(orginwalk), len(destinationwalk)), 10000000000.0)
+    for a in range(len(route.stop_ids)):
+        walktofirststoptime = orginwalk[:, a] / 60
+        bestdeparturetime = route.next_time(a, time_of_day + walktofirststoptime)
+        waitforbustime = bestdeparturetime - time_of_day - walktofirststoptime
+        for b in range(len(route.stop_ids)):
+            bestarrivaltime = route.next_time(b, bestdeparturetime)
+            onthebustime = bestarrivaltime - bestdeparturetime
+            walktodestinationtime = destinationwalk[:, b] / 60
+            traveltime = walktofirststoptime + waitforbustime + onthebustime + walktodestinationtime
+            besttraveltime = numpy.where(traveltime < besttraveltime, traveltime, besttraveltime)
+    return besttraveltime
+
+
+def CalculateArriveByTimes(orginwalk, destinationwalk, currentroute, arrive_by: float):
+    # CalculateTravelTimes run backwards for trips that must reach the destination by arrive_by: for each pair of
+    # stops the latest bus that gets there in time and the latest departure at the first stop that catches it.
+    # The result is the minutes from leaving the origin to arrive_by, 10000000000 where the route cannot make it.
+    route = currentroute if isinstance(currentroute, RouteTimes) else RouteTimes(currentroute)
+    orginwalk = numpy.atleast_2d(numpy.asarray(orginwalk, dtype=float))
+    destinationwalk = numpy.atleast_2d(numpy.asarray(destinationwalk, dtype=float))
+    besttraveltime = numpy.full(max(len(orginwalk), len(destinationwalk)), 10000000000.0)
+    for b in range(len(route.stop_ids)):
+        walktodestinationtime = destinationwalk[:, b] / 60
+        latestarrivaltime = route.previous_time(b, arrive_by - walktodestinationtime, inclusive=True)
+        for a in range(len(route.stop_ids)):
+            latestdeparturetime = route.previous_time(a, latestarrivaltime)
+            walktofirststoptime = orginwalk[:, a] / 60
+            traveltime = arrive_by - (latestdeparturetime - walktofirststoptime)
+            besttraveltime = numpy.where(traveltime < besttraveltime, traveltime, besttraveltime)
+    return besttraveltime
+
+
+def transit_premium(walking, transit):
+    # Minutes transit saves over walking, and transit time as a share of walking time. Either is NaN where the
+    # building cannot be reached by transit or on foot.
+    walking = numpy.asarray(walking, dtype=float)
+    transit = numpy.asarray(transit, dtype=float)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ratio = numpy.where(walking > 0, transit / walking, numpy.nan)
+    return {"Transit Premium": walking - transit, "Transit Ratio": ratio}
@@ -0,0 +1,215 @@
+import json
+import os
+import pickle
+import networkx
+import numpy
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.spatial
+import profiling
+from resultcache import content_hash
+
+
+class WalkGraph:
+    # Walk network in compressed sparse row form: node i's out-edges are indices[indptr[i]:indptr[i + 1]] with
+    # walking seconds in seconds[...]. The reverse (in-edge) CSR is stored too so "walk from everywhere to one node"
+    # is a plain single-source Dijkstra. Nodes are sorted OSM IDs with their lon/lat in x/y.
+    files = ("node_ids", "x", "y", "indptr", "indices", "seconds", "rindptr", "rindices", "rseconds")
+
+    def __init__(self, node_ids, x, y, indptr, indices, seconds, rindptr, rindices, rseconds, speed_kph: float = 5,
+                 path: str = None, digest: str = None):
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+        self.indptr = indptr
+        self.indices = indices
+        self.seconds = seconds
+        self.rindptr = rindptr
+        self.rindices = rindices
+        self.rseconds = rseconds
+        self.speed_kph = speed_kph
+        self.path = path
+        self._matrices = {}
+        self._tree = None
+        self._digest = digest
+
+    @classmethod
+    def from_networkx(cls, graph: networkx.MultiDiGraph, speed_kph: float = 5):
+        # Parallel edges keep the shortest one, which is all a shortest path search would ever use
+        node_ids = numpy.array(sorted(graph.nodes), dtype=numpy.int64)
+        x = numpy.array([graph.nodes[node]["x"] for node in node_ids.tolist()], dtype=float)
+        y = numpy.array([graph.nodes[node]["y"] for node in node_ids.tolist()], dtype=float)
+        edges = list(graph.edges(data="length", default=0))
+        source = numpy.searchsorted(node_ids, numpy.array([edge[0] for edge in edges], dtype=numpy.int64))
+        target = numpy.searchsorted(node_ids, numpy.array([edge[1] for edge in edges], dtype=numpy.int64))
+        seconds = numpy.array([edge[2] for edge in edges], dtype=float) * 3.6 / speed_kph
+        order = numpy.lexsort((seconds, target, source))
+        source, target, seconds = source[order], target[order], seconds[order]
+        first = numpy.ones(len(source), dtype=bool)
+        first[1:] = (source[1:] != source[:-1]) | (target[1:] != target[:-1])
+        source, target, seconds = source[first], target[first], seconds[first]
+        forward = _csr(source, target, seconds, len(node_ids))
+        reverse = _csr(target, source, seconds, len(node_ids))
+        return cls(node_ids, x, y, *forward, *reverse, speed_kph=speed_kph)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in self.files:
+            numpy.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"speed_kph": self.speed_kph, "nodes": len(self.node_ids), "edges": len(self.indices),
+                       "digest": self.digest()}, f)
+        # Files derived from the old graph in this folder hold its node positions and IDs
+        for name in ("nodetree.pickle", "stopnodes.json"):
+            if os.path.isfile(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        self.path = path
+
+    def fingerprint(self):
+        # Identifies one compiled graph, for files that store its node IDs: a rebuild rewrites meta.json, so its
+        # modification time changes even when the node and edge counts do not
+        meta = os.path.join(self.path, "meta.json") if self.path is not None else None
+        modified = os.path.getmtime(meta) if meta is not None and os.path.isfile(meta) else None
+        return [len(self.node_ids), len(self.indices), modified]
+
+    def digest(self):
+        # Content hash of the edges for result cache keys, saved in meta.json so a loaded graph is never rehashed
+        if self._digest is None:
+            self._digest = content_hash(self.indptr, self.indices, self.seconds)
+        return self._digest
+
+    @classmethod
+    def load(cls, path: str):
+        # Memory mapped, so loading costs a few file opens and pages are read only as searches touch them
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = [numpy.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in cls.files]
+        return cls(*arrays, speed_kph=meta["speed_kph"], path=path, digest=meta.get("digest"))
+
+    def __reduce__(self):
+        # Worker processes reopen the memory mapped files instead of receiving a pickled copy of the arrays
+        if self.path is not None:
+            return (WalkGraph.load, (self.path,))
+        return (WalkGraph, tuple(getattr(self, name) for name in self.files) + (self.speed_kph,))
+
+    def matrix(self, reverse: bool = False):
+        if reverse not in self._matrices:
+            if reverse:
+                data = (self.rseconds, self.rindices, self.rindptr)
+            else:
+                data = (self.seconds, self.indices, self.indptr)
+            self._matrices[reverse] = scipy.sparse.csr_matrix(data, shape=(len(self.node_ids), len(self.node_ids)))
+        return self._matrices[reverse]
+
+    def node_index(self, nodes):
+        # Positions of OSM node IDs in the graph, -1 for IDs the graph does not have
+        nodes = numpy.asarray(nodes, dtype=numpy.int64)
+        index = numpy.minimum(numpy.searchsorted(self.node_ids, nodes), len(self.node_ids) - 1)
+        return numpy.where(self.node_ids[index] == nodes, index, -1)
+
+    def walk_seconds(self, target, reverse: bool = True, limit: float = numpy.inf):
+        # Seconds from every node to target (reverse=True) or from target to every node, inf when unreachable
+        # or farther than limit. A list of targets gives one row per target.
+        index = self.node_index(target)
+        if (index < 0).any():
+            raise KeyError("Node " + str(numpy.asarray(target)[index < 0].tolist()) + " is not in the walk graph")
+        seconds = scipy.sparse.csgraph.dijkstra(self.matrix(reverse), directed=True, indices=index, limit=limit)
+        if profiling.active.enabled:
+            # csgraph does not expose its expansions; every node it settled ends with a finite distance
+            profiling.active.count("dijkstra_searches", numpy.size(index))
+            profiling.active.count("dijkstra_settled_nodes", int(numpy.isfinite(seconds).sum()))
+        return seconds
+
+    def seconds_within(self, sources, limit: float):
+        # Walking seconds from each source (node positions) to the nodes it can reach within limit, as the local
+        # node positions searched and a (sources, local nodes) array with inf past limit. Only nodes within the
+        # distance any path of limit seconds could cover from some source are searched, so the cost follows the
+        # size of the neighbourhood rather than of the graph. The distance bound comes from the graph's own
+        # edges (the fewest seconds per unit of straight-line distance), so the result equals a full search.
+        self.node_tree()
+        reach = limit / self.seconds_per_distance() if self.seconds_per_distance() > 0 else numpy.inf
+        sources = numpy.asarray(sources)
+        if numpy.isfinite(reach):
+            # One ball around all the sources, which holds every source's own ball
+            points = numpy.column_stack([numpy.asarray(self.x)[sources] * self._scale, numpy.asarray(self.y)[sources]])
+            centre = (points.min(axis=0) + points.max(axis=0)) / 2
+            radius = numpy.hypot(*(points - centre).T).max() + reach
+            local = numpy.union1d(self._tree.query_ball_point(centre, radius), sources)
+        else:
+            local = numpy.arange(len(self.node_ids))
+        matrix = self.matrix()[local][:, local]
+        seconds = scipy.sparse.csgraph.dijkstra(matrix, directed=True, indices=numpy.searchsorted(local, sources),
+                                                limit=limit)
+        if profiling.active.enabled:
+            profiling.active.count("dijkstra_searches", len(sources))
+            profiling.active.count("dijkstra_settled_nodes", int(numpy.isfinite(seconds).sum()))
+        return local, seconds
+
+    def seconds_per_distance(self):
+        # Lower bound on walking seconds per unit of the node tree's distance, over every edge; 0 when some edge
+        # is free, which disables the bound
+        if not hasattr(self, "_seconds_per_distance"):
+            self.node_tree()
+            source = numpy.repeat(numpy.arange(len(self.node_ids)), numpy.diff(self.indptr))
+            x, y = numpy.asarray(self.x) * self._scale, numpy.asarray(self.y)
+            distance = numpy.hypot(x[source] - x[self.indices], y[source] - y[self.indices])
+            moving = distance > 0
+            self._seconds_per_distance = float(numpy.min(numpy.asarray(self.seconds)[moving] / distance[moving])) \
+                if moving.any() else numpy.inf
+        return self._seconds_per_distance
+
+    def node_tree(self):
+        # KD-tree over the nodes with longitudes scaled by the cosine of the graph's mean latitude, so its distance
+        # is close to ground distance at city scale. A saved graph keeps the built tree in its folder, so other
+        # runs and pool workers load it instead of building it again.
+        if self._tree is None:
+            path = os.path.join(self.path, "nodetree.pickle") if self.path is not None else None
+            if path is not None and os.path.isfile(path):
+                with open(path, "rb") as f:
+                    self._scale, self._tree = pickle.load(f)
+            else:
+                self._scale = numpy.cos(numpy.radians(numpy.mean(self.y)))
+                self._tree = scipy.spatial.cKDTree(numpy.column_stack([numpy.asarray(self.x) * self._scale, self.y]))
+                if path is not None:
+                    with open(path + ".tmp", "wb") as f:
+                        pickle.dump((self._scale, self._tree), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(path + ".tmp", path)
+        return self._tree
+
+    def nearest_nodes(self, x, y):
+        # Nearest graph node to each lon/lat point
+        self.node_tree()
+        points = numpy.column_stack([numpy.ravel(x) * self._scale, numpy.ravel(y)])
+        nodes = numpy.asarray(self.node_ids)[self._tree.query(points)[1]]
+        return int(nodes[0]) if numpy.ndim(x) == 0 else nodes
+
+    def to_networkx(self):
+        # Only for code that still needs a NetworkX graph; routing here works on the CSR arrays
+        graph = networkx.MultiDiGraph(crs="epsg:4326")
+        node_ids = self.node_ids.tolist()
+        graph.add_nodes_from((node, {"x": x, "y": y}) for node, x, y in zip(node_ids, self.x.tolist(), self.y.tolist()))
+        source = numpy.repeat(numpy.arange(len(node_ids)), numpy.diff(self.indptr))
+        for u, v, seconds in zip(source.tolist(), self.indices.tolist(), self.seconds.tolist()):
+            graph.add_edge(node_ids[u], node_ids[v], length=seconds * self.speed_kph / 3.6, travel_time=seconds)
+        return graph
+
+
+def _csr(source, target, seconds, nodes: int):
+    order = numpy.lexsort((target, source))
+    indptr = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(source, minlength=nodes))]).astype(numpy.int32)
+    return indptr, target[order].astype(numpy.int32), seconds[order].astype(numpy.float32)
+
+
+def load_walk_graph(graphml_path: str, speed_kph: float = 5):
+    # Compiled CSR cache next to the GraphML file. The GraphML is parsed only when the cache is missing, older
+    # than the GraphML or built for a different walking speed.
+    path = os.path.splitext(graphml_path)[0] + ".walkgraph"
+    meta = os.path.join(path, "meta.json")
+    if os.path.isfile(meta) and os.path.getmtime(meta) >= os.path.getmtime(graphml_path):
+        graph = WalkGraph.load(path)
+        if graph.speed_kph == speed_kph:
+            return graph
+    import osmnx
+    graph = WalkGraph.from_networkx(osmnx.load_graphml(graphml_path), speed_kph)
+    graph.save(path)
+    return WalkGraph.load(path)
@@ -0,0 +1,110 @@
+import json
+import multiprocessing as mp
+import os
+import geopandas
+import networkx
+import numpy
+import pandas
+import profiling
+from walkgraph import WalkGraph
+
+
+def walk_times_to_node(graph, nodes, target, weight: str = "travel_time"):
+    # One single-source Dijkstra from target over the reversed graph gives the walk from every node to target.
+    # Each unique node is looked up once; nodes that cannot reach target come back as NaN. graph is either a
+    # compiled WalkGraph, searched on its CSR arrays, or a NetworkX graph with a travel_time edge attribute.
+    unique, inverse = numpy.unique(numpy.asarray(nodes), return_inverse=True)
+    if isinstance(graph, WalkGraph):
+        return node_walk_times(graph, graph.walk_seconds(target), unique)[inverse.reshape(-1)]
+    lengths = networkx.single_source_dijkstra_path_length(graph.reverse(copy=False), target, weight=weight)
+    times = numpy.array([lengths.get(node, numpy.nan) for node in unique.tolist()], dtype=float)
+    return times[inverse.reshape(-1)]
+
+
+def node_walk_times(graph: WalkGraph, seconds, nodes):
+    # One search's seconds (one per graph node) looked up for each of nodes, NaN where a node is not in the graph or
+    # cannot be reached. Keeping only the search lets callers look buildings up a chunk at a time.
+    index = graph.node_index(nodes)
+    times = numpy.where(index >= 0, numpy.asarray(seconds)[index], numpy.nan)
+    times[numpy.isinf(times)] = numpy.nan
+    return times
+
+
+def walk_times_to_nodes(graph: WalkGraph, nodes, targets):
+    # Walk from every node to each target, shape (nodes, targets), with all searches in one csgraph call
+    unique, inverse = numpy.unique(numpy.asarray(nodes), return_inverse=True)
+    index = graph.node_index(unique)
+    times = numpy.where(index[:, None] >= 0, graph.walk_seconds(targets)[:, index].T, numpy.nan)
+    times[numpy.isinf(times)] = numpy.nan
+    return times[inverse.reshape(-1)]
+
+
+def walk_times_from_nodes(graph: WalkGraph, sources, targets):
+    # Walk from each source to each target node, shape (sources, targets)
+    times = graph.walk_seconds(sources, reverse=False)[:, graph.node_index(targets)]
+    times[numpy.isinf(times)] = numpy.nan
+    return times
+
+
+_precompute_graph = None
+_precompute_nodes = None
+
+
+def _init_precompute_worker(graph, nodes):
+    global _precompute_graph, _precompute_nodes
+    _precompute_graph = graph
+    _precompute_nodes = nodes
+
+
+def _precompute_stop(job):
+    stop_id, stop_node, path = job
+    times = walk_times_to_node(_precompute_graph, _precompute_nodes, stop_node).astype(numpy.float32)
+    numpy.save(path[:-4] + ".tmp.npy", times)
+    os.replace(path[:-4] + ".tmp.npy", path)
+    return stop_id
+
+
+def precompute_walk_table(graph, gdfclean: geopandas.GeoDataFrame, stop_nodes: dict,
+                          checkpoint_dir: str, processes: int = None, callback=None):
+    # Walking seconds from every building to every stop, one Dijkstra per stop over the unique nearestnodes.
+    # Each finished stop is saved to checkpoint_dir along with the graph node it was computed for, so an interrupted
+    # run, or a run after a schedule change, only computes the stops that are missing or whose node moved. Changing
+    # the buildings or the walk graph starts over.
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    nodes, inverse = numpy.unique(gdfclean["nearestnode"].to_numpy(), return_inverse=True)
+    graphhash = graph.digest() if isinstance(graph, WalkGraph) else None
+    nodes_path = os.path.join(checkpoint_dir, "nodes.npy")
+    manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+    manifest = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    if ("stops" not in manifest or manifest["graph"] != graphhash or not os.path.isfile(nodes_path)
+            or not numpy.array_equal(numpy.load(nodes_path), nodes)):
+        for name in os.listdir(checkpoint_dir):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(checkpoint_dir, name))
+        numpy.save(nodes_path, nodes)
+        manifest = {"graph": graphhash, "stops": {}}
+    paths = {stop_id: os.path.join(checkpoint_dir, stop_id + ".npy") for stop_id in stop_nodes}
+    jobs = [(stop_id, stop_nodes[stop_id], paths[stop_id]) for stop_id in stop_nodes
+            if manifest["stops"].get(stop_id) != int(stop_nodes[stop_id]) or not os.path.isfile(paths[stop_id])]
+    profiling.active.count("walk_table_stops_computed", len(jobs))
+    profiling.active.count("walk_table_stops_reused", len(stop_nodes) - len(jobs))
+    if callback is not None:
+        callback("{} of {} stops reused from {}".format(len(stop_nodes) - len(jobs), len(stop_nodes), checkpoint_dir))
+    if jobs:
+        with mp.Pool(min(processes or mp.cpu_count(), len(jobs)), initializer=_init_precompute_worker,
+                     initargs=(graph, nodes)) as pool:
+            for stop_id in pool.imap_unordered(_precompute_stop, jobs):
+                manifest["stops"][stop_id] = int(stop_nodes[stop_id])
+                with open(manifest_path + ".tmp", "w") as f:
+                    json.dump(manifest, f)
+                os.replace(manifest_path + ".tmp", manifest_path)
+                if callback is not None:
+                    callback(stop_id)
+    busdatabase = gdfclean.set_index(["element", "id"])
+    walktimes = pandas.DataFrame({stop_id: numpy.load(paths[stop_id])[inverse.reshape(-1)] for stop_id in stop_nodes},
+                                 index=busdatabase.index)
+    return geopandas.GeoDataFrame(pandas.concat([busdatabase, walktimes], axis=1), geometry="geometry",
+                                  crs=gdfclean.crs)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import re
+import numpy
+import pandas
+import pyarrow.feather
+import pyarrow.ipc
+from resultcache import content_hash
+
+
+class WalkMatrix:
+    # Building-to-stop walking seconds with one row per graph node instead of per building, since every building
+    # snapped to the same node has the same walks. Seconds are rounded to whole uint16 values with missing as
+    # 65535. Walks of 65535 seconds (about 18 hours) or more are stored as missing too, since no trip would use them.
+    # Buildings are found through sorted keys (OSM id * 4 + element code) that map to a row.
+    files = ("nodes", "seconds", "building_keys", "building_rows")
+    missing = 65535
+    elements = {"n": 0, "w": 1, "r": 2}
+
+    def __init__(self, nodes, seconds, building_keys, building_rows, stop_ids: [str], path: str = None,
+                 hashes: dict = None):
+        self.nodes = nodes
+        self.seconds = seconds
+        self.building_keys = building_keys
+        self.building_rows = building_rows
+        self.stop_ids = list(stop_ids)
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.path = path
+        self._hashes = hashes
+
+    @classmethod
+    def from_table(cls, busdatabase: pandas.DataFrame, stop_ids: [str]):
+        # busdatabase is the precomputed building-by-stop walk table, indexed by (element, id), with nearestnode
+        nodes, first, inverse = numpy.unique(busdatabase["nearestnode"].to_numpy(), return_index=True,
+                                             return_inverse=True)
+        walk = busdatabase[list(stop_ids)].to_numpy(dtype=float)[first]
+        seconds = numpy.full(walk.shape, cls.missing, dtype=numpy.uint16)
+        known = numpy.isfinite(walk) & (numpy.round(walk) < cls.missing)
+        seconds[known] = numpy.round(walk[known])
+        keys = cls.keys(busdatabase.index)
+        order = numpy.argsort(keys, kind="stable")
+        return cls(nodes, seconds, keys[order], inverse.reshape(-1)[order].astype(numpy.int32), stop_ids)
+
+    @classmethod
+    def keys(cls, index):
+        # Integer key of each (element, id) building key; element may be the full "node"/"way" or its first letter
+        if not isinstance(index, pandas.MultiIndex):
+            index = pandas.MultiIndex.from_tuples(index)
+        elements = index.get_level_values(0).astype(str).str[0].map(cls.elements).to_numpy(dtype=numpy.int64)
+        return index.get_level_values(1).to_numpy(dtype=numpy.int64) * 4 + elements
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in self.files:
+            numpy.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"stop_ids": self.stop_ids, "nodes": len(self.nodes), "buildings": len(self.building_keys),
+                       "hashes": self.hashes()}, f)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str):
+        # Memory mapped like WalkGraph.load, so only the rows a run looks up are read from disk
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = [numpy.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in cls.files]
+        return cls(*arrays, meta["stop_ids"], path=path, hashes=meta.get("hashes"))
+
+    def hashes(self):
+        # Content hashes of the building rows and of each stop's column, saved in meta.json so cache keys never
+        # rehash the matrix
+        if self._hashes is None:
+            self._hashes = {"rows": content_hash(self.nodes, self.building_keys, self.building_rows),
+                            "stops": {stop_id: content_hash(self.seconds[:, i]) for i, stop_id in enumerate(self.stop_ids)}}
+        return self._hashes
+
+    def digest(self, stop_ids: [str]):
+        # Identifies the walks between every building and stop_ids, from the saved hashes
+        hashes = self.hashes()
+        return hashlib.sha256(" ".join([hashes["rows"]] + [hashes["stops"][stop_id] for stop_id in stop_ids]).encode()).hexdigest()
+
+    def rows(self, keys):
+        # Matrix row of each building key, -1 for buildings the matrix does not have
+        keys = self.keys(keys)
+        index = numpy.minimum(numpy.searchsorted(self.building_keys, keys), len(self.building_keys) - 1)
+        return numpy.where(self.building_keys[index] == keys, self.building_rows[index], -1)
+
+    def walk(self, keys, stop_ids: [str]):
+        # Walking seconds from each building key to each stop, shape (keys, stops), NaN where unknown
+        columns = [self.stop_index[stop_id] for stop_id in stop_ids]
+        rows = self.rows(keys)
+        values = numpy.asarray(self.seconds[numpy.maximum(rows, 0)][:, columns], dtype=float)
+        values[values == self.missing] = numpy.nan
+        values[rows < 0] = numpy.nan
+        return values
+
+    def building_walk(self, key: tuple, stop_ids: [str]):
+        if self.rows([key])[0] < 0:
+            raise KeyError(str(key[0]) + str(key[1]) + " is not a building in the walk matrix")
+        return self.walk([key], stop_ids)[0]
+
+
+def load_walk_matrix(busdatabase_path: str):
+    # Compiled walk matrix cache next to BusDatabase.feather, built from the feather's stop and index columns (never
+    # its geometry) when the cache is missing or older than the feather. The (element, id) index comes back from the
+    # pandas metadata geopandas stores in the feather.
+    path = os.path.splitext(busdatabase_path)[0] + ".walkmatrix"
+    meta = os.path.join(path, "meta.json")
+    if os.path.isfile(meta) and os.path.getmtime(meta) >= os.path.getmtime(busdatabase_path):
+        return WalkMatrix.load(path)
+    names = pyarrow.ipc.open_file(busdatabase_path).schema.names
+    stop_ids = [name for name in names if re.fullmatch(r"[nw]\d+", name)]
+    table = pyarrow.feather.read_table(busdatabase_path, columns=["element", "id", "nearestnode"] + stop_ids)
+    busdatabase = table.to_pandas()
+    WalkMatrix.from_table(busdatabase, stop_ids).save(path)
+    return WalkMatrix.load(path)
@@ -0,0 +1,74 @@
+import multiprocessing as mp
+import numpy
+
+_score = {}
+
+
+def _init_score_worker(graph, index, nodeweights, thresholds):
+    _score["graph"] = graph
+    # Weight on every graph node, so each search's local nodes look theirs up directly
+    _score["weights"] = numpy.bincount(index, weights=nodeweights, minlength=len(graph.node_ids))
+    _score["thresholds"] = thresholds
+
+
+def _score_chunk(sources):
+    # One bounded Dijkstra per source over the nodes within reach of the largest threshold
+    local, seconds = _score["graph"].seconds_within(sources, _score["thresholds"][-1])
+    weights = _score["weights"][local]
+    return numpy.stack([(seconds <= threshold) @ weights for threshold in _score["thresholds"]], axis=1)
+
+
+def category_weights(gdfclean, weights: dict):
+    # Weight of each feature from its OSM tag columns, the largest weight among the tags it has. Without weights
+    # every feature counts once; with weights, features carrying none of the weighted tags count zero.
+    if not weights:
+        return numpy.ones(len(gdfclean))
+    result = numpy.zeros(len(gdfclean))
+    for tag, weight in weights.items():
+        if tag in gdfclean.columns:
+            result = numpy.where(gdfclean[tag].notna().to_numpy(), numpy.maximum(result, weight), result)
+    return result
+
+
+def walking_score(graph, nodes, weights, thresholds: [float], processes: int = None, chunk_size: int = 64):
+    # For every feature, the summed weight of the other features within each walk threshold in minutes, shape
+    # (features, thresholds) with thresholds ascending. Features on the same graph node share one search and are
+    # counted through their node's total weight, so the work grows with the number of unique nodes rather than
+    # with pairs of buildings.
+    nodes = numpy.asarray(nodes)
+    weights = numpy.asarray(weights, dtype=float)
+    thresholds = numpy.sort(numpy.asarray(thresholds, dtype=float)) * 60
+    scores = numpy.full((len(nodes), len(thresholds)), numpy.nan)
+    # Features whose node is not in the graph (e.g. a failed snap stored as -1) get no score and count for no one
+    index = graph.node_index(nodes) if len(nodes) else numpy.zeros(0, dtype=numpy.int64)
+    found = index >= 0
+    if not found.any():
+        return scores
+    unique, inverse = numpy.unique(index[found], return_inverse=True)
+    inverse = inverse.reshape(-1)
+    nodeweights = numpy.bincount(inverse, weights=weights[found], minlength=len(unique))
+    # Nodes grouped by square cells as wide as a search reaches, so a chunk's sources share most of their
+    # neighbourhood and each search only covers the few cells around its chunk
+    graph.node_tree()
+    x, y = numpy.asarray(graph.x)[unique] * graph._scale, numpy.asarray(graph.y)[unique]
+    cell = thresholds[-1] / graph.seconds_per_distance() if graph.seconds_per_distance() > 0 else numpy.inf
+    if not numpy.isfinite(cell) or cell <= 0:
+        cell = max(numpy.ptp(x), numpy.ptp(y)) or 1
+    cells = numpy.column_stack([numpy.floor(x / cell), numpy.floor(y / cell)])
+    order = numpy.lexsort((y, x, cells[:, 0], cells[:, 1]))
+    starts = numpy.flatnonzero(numpy.concatenate([[True], (numpy.diff(cells[order], axis=0) != 0).any(axis=1)]))
+    chunks = []
+    for first, last in zip(starts, numpy.append(starts[1:], len(unique))):
+        chunks += [unique[order[start:min(start + chunk_size, last)]] for start in range(first, last, chunk_size)]
+    processes = min(processes or mp.cpu_count(), len(chunks))
+    initargs = (graph, unique, nodeweights, thresholds)
+    if processes > 1:
+        with mp.Pool(processes, initializer=_init_score_worker, initargs=initargs) as pool:
+            results = pool.map(_score_chunk, chunks)
+    else:
+        _init_score_worker(*initargs)
+        results = [_score_chunk(chunk) for chunk in chunks]
+    nodescores = numpy.empty((len(unique), len(thresholds)))
+    nodescores[order] = numpy.concatenate(results)
+    scores[found] = nodescores[inverse] - weights[found][:, None]
+    return scores
@@ -0,0 +1,109 @@
+import multiprocessing as mp
+import pickle
+import time
+from multiprocessing import shared_memory
+import numpy
+import profiling
+from utils import CalculateArriveByTimes, CalculateTravelTimes, RouteTimes
+
+
+def share_array(array: numpy.ndarray):
+    # Copies array into a new shared memory block; the returned spec is all a worker needs to attach to it
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    numpy.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=shm.buf)
+
+
+_worker = {}
+
+
+def _init_worker(walkspec, resultspec, stop_ids, routes):
+    _worker["walk_shm"], _worker["walk"] = attach_array(walkspec)
+    _worker["result_shm"], _worker["result"] = attach_array(resultspec)
+    columns = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    _worker["routes"] = [RouteTimes(route) for route in routes]
+    _worker["columns"] = [[columns[stop_id] for stop_id in route.stop_ids] for route in _worker["routes"]]
+
+
+def _route_chunk(task):
+    started = time.perf_counter()
+    routeindex, start, stop, destinationwalk, time_of_day, origin = task
+    route = _worker["routes"][routeindex]
+    columns = _worker["columns"][routeindex]
+    buildingwalk = _worker["walk"][start:stop, columns]
+    destinationwalk = destinationwalk[columns]
+    if origin:
+        times = CalculateTravelTimes(destinationwalk, buildingwalk, route, time_of_day)
+    else:
+        times = CalculateArriveByTimes(buildingwalk, destinationwalk, route, time_of_day)
+    _worker["result"][routeindex, start:stop] = times
+    return routeindex, time.perf_counter() - started
+
+
+class TravelTimePool:
+    # One worker pool per tool run. The building-by-stop walk matrix and the result table live in shared memory,
+    # so workers only receive (route, chunk range) tasks and never a copy of busdatabase or gdfclean.
+    def __init__(self, walkmatrix: numpy.ndarray, stop_ids: [str], routes: list, processes: int = None,
+                 chunk_size: int = 4096):
+        started = time.perf_counter()
+        self.routes = routes
+        self.chunk_size = chunk_size
+        self.buildings = len(walkmatrix)
+        self._walk_shm, walkspec = share_array(numpy.ascontiguousarray(walkmatrix))
+        self._result_shm, resultspec = share_array(numpy.zeros((len(routes), self.buildings)))
+        self.results = numpy.ndarray((len(routes), self.buildings), buffer=self._result_shm.buf)
+        initargs = (walkspec, resultspec, list(stop_ids), routes)
+        self.stats = {"shared_bytes": walkmatrix.nbytes + self.results.nbytes,
+                      "initializer_bytes": len(pickle.dumps(initargs)), "task_bytes": 0, "tasks": 0}
+        processes = processes or mp.cpu_count()
+        self._pool = mp.Pool(processes, initializer=_init_worker, initargs=initargs)
+        self._pool.map(int, range(processes))
+        self.stats["startup_seconds"] = time.perf_counter() - started
+        self.stats["route_seconds"] = {route.route_name: 0.0 for route in routes}
+        profiling.active.add_span("Worker pool startup", started, self.stats["startup_seconds"], processes=processes)
+        profiling.active.count("pool_shared_bytes", self.stats["shared_bytes"])
+        profiling.active.count("pool_initializer_bytes", self.stats["initializer_bytes"])
+
+    def route_times(self, destinationwalk, time_of_day: float, origin: bool = True, start: int = 0,
+                    stop: int = None):
+        # Travel times for every route and the buildings in rows start:stop of the walk matrix (all of them by
+        # default). destinationwalk is the point of interest's walk row over stop_ids; with origin=True it is where
+        # the trip starts at time_of_day, otherwise where it has to arrive by time_of_day.
+        destinationwalk = numpy.asarray(destinationwalk, dtype=float)
+        stop = self.buildings if stop is None else stop
+        tasks = [(routeindex, first, min(first + self.chunk_size, stop), destinationwalk, time_of_day, origin)
+                 for routeindex in range(len(self.routes)) for first in range(start, stop, self.chunk_size)]
+        taskbytes = sum(len(pickle.dumps(task)) for task in tasks)
+        self.stats["task_bytes"] += taskbytes
+        self.stats["tasks"] += len(tasks)
+        profiling.active.count("pool_task_bytes", taskbytes)
+        profiling.active.count("pool_tasks", len(tasks))
+        started = time.perf_counter()
+        for routeindex, seconds in self._pool.map(_route_chunk, tasks, chunksize=1):
+            self.stats["route_seconds"][self.routes[routeindex].route_name] += seconds
+        if profiling.active.enabled:
+            # Worker time summed over each route's tasks, laid out from when the tasks were sent
+            for route in self.routes:
+                profiling.active.add_span("Route " + route.route_name, started, self.stats["route_seconds"][route.route_name],
+                                          buildings=stop - start)
+        return {route.route_name: self.results[i, start:stop].copy() for i, route in enumerate(self.routes)}
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        del self.results
+        for shm in (self._walk_shm, self._result_shm):
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()